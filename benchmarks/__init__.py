@@ -0,0 +1 @@
+# benchmarks: gerador de base sintética do ERP e benchmark de escala
@@ -0,0 +1,260 @@
+# benchmarks/executar.py
+"""
+Benchmark de escala do recorrencia_basicos.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.executar
+    python -m benchmarks.executar --tamanhos 10000 100000 --saida benchmarks/resultados.json
+    python -m benchmarks.executar --comparar benchmarks/resultados_main.json --tolerancia 1.3
+
+Para cada tamanho, gera uma base sintética (ver gerador_erp) e mede tempo
+e pico de memória (tracemalloc) de carregar_bases, de cada análise, do
+painel e de cada plot_*. O resultado vai para um JSON; com --comparar, as
+etapas que ficaram mais lentas que `tolerancia` x a referência são listadas
+e o processo sai com código 1.
+"""
+
+import argparse
+import gc
+import io
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional
+
+import matplotlib
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import recorrencia_basicos as rb
+import visualizacoes_recorrencia as vis
+from benchmarks.gerador_erp import XLSX_MAX_LINHAS, gerar_base_erp, gravar_planilhas
+
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# Gravar um .xlsx de 1M linhas leva muitos minutos: acima disso a carga é
+# medida a partir do DataFrame bruto (_tratar_erp) e do snapshot
+MAX_LINHAS_EXCEL_PADRAO = 100_000
+
+ANALISES = [
+    ("basicos_reqs_mes", rb.basicos_reqs_mes),
+    ("basicos_reqs_subsequentes", rb.basicos_reqs_subsequentes),
+    ("basicos_semanal_por_obra", rb.basicos_semanal_por_obra),
+    ("intervalo_medio_entre_pedidos_basicos", rb.intervalo_medio_entre_pedidos_basicos),
+    ("itens_basicos_pequenas_qtds_alta_frequencia", rb.itens_basicos_pequenas_qtds_alta_frequencia),
+]
+
+
+def _linhas(resultado: Any) -> Optional[int]:
+    if isinstance(resultado, pd.DataFrame):
+        return int(len(resultado))
+    if isinstance(resultado, dict):
+        return int(sum(len(t) for t in resultado.values() if isinstance(t, pd.DataFrame)))
+    return None
+
+
+def medir(func: Callable[[], Any], repeticoes: int = 1, memoria: bool = True) -> Dict[str, Any]:
+    """
+    Melhor tempo de `repeticoes` execuções e, à parte (o tracemalloc deixa o
+    código mais lento), o pico de memória alocada numa execução extra.
+
+    O tracemalloc enxerga alocações do Python e do numpy/pandas, mas não os
+    buffers do Arrow (ex.: leitura do snapshot Feather).
+    """
+    tempos = []
+    resultado = None
+    for _ in range(max(1, int(repeticoes))):
+        gc.collect()
+        t0 = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - t0)
+
+    pico_mb = None
+    if memoria:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            pico_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "segundos": round(min(tempos), 6),
+        "pico_mem_mb": round(pico_mb, 3) if pico_mb is not None else None,
+        "linhas_saida": _linhas(resultado),
+        "resultado": resultado,
+    }
+
+
+def _renderizar(plot_func: Callable, *args, **kwargs) -> Callable[[], None]:
+    # Figura completa: montagem + rasterização (como no st.pyplot)
+    def rodar():
+        fig = plot_func(*args, **kwargs)
+        fig.savefig(io.BytesIO(), format="png")
+        plt.close(fig)
+    return rodar
+
+
+def benchmark_tamanho(
+    n_linhas: int,
+    seed: int,
+    repeticoes: int,
+    memoria: bool,
+    max_linhas_excel: int,
+    log: Callable[[str], None] = print,
+) -> list:
+    registros = []
+
+    def registrar(etapa: str, func: Callable[[], Any], linhas_entrada: int) -> Any:
+        r = medir(func, repeticoes=repeticoes, memoria=memoria)
+        resultado = r.pop("resultado")
+        registros.append({"linhas": n_linhas, "etapa": etapa, "linhas_entrada": linhas_entrada, **r})
+        pico = f"{r['pico_mem_mb']:>9.1f} MB" if r["pico_mem_mb"] is not None else ""
+        log(f"  {etapa:<50} {r['segundos']:>10.3f}s  {pico}")
+        return resultado
+
+    log(f"== {n_linhas:,} linhas ==")
+    bruto, codigos = gerar_base_erp(n_linhas, seed=seed)
+
+    with tempfile.TemporaryDirectory(prefix="bench_recorrencia_") as pasta:
+        pasta = Path(pasta)
+        com_excel = n_linhas <= min(int(max_linhas_excel), XLSX_MAX_LINHAS)
+        gravar_planilhas(bruto, codigos, pasta, gravar_erp=com_excel)
+
+        if com_excel:
+            registrar(
+                "carregar_bases[xlsx]",
+                lambda: rb.carregar_bases(usar_snapshot=False, diretorio=pasta),
+                n_linhas,
+            )
+            # 1ª carga grava o snapshot; a medida é da leitura dele
+            rb.carregar_bases(diretorio=pasta)
+            df = registrar("carregar_bases[snapshot]", lambda: rb.carregar_bases(diretorio=pasta), n_linhas)
+        else:
+            cod_basicos = set(codigos["Código"])
+            df = registrar(
+                "_tratar_erp",
+                lambda: rb._tratar_erp(bruto.copy(), cod_basicos),
+                n_linhas,
+            )
+            # Mesmos passos de carregar_bases: ordenada por data antes do
+            # snapshot e com as colunas de calendário depois
+            df = registrar("ordenar_por_data", lambda: rb.ordenar_por_data(df), n_linhas)
+            fontes = [pasta / rb.ARQUIVO_BASICOS]
+            rb.gravar_snapshot(df, pasta, fontes)
+            registrar("ler_snapshot", lambda: rb.ler_snapshot(pasta, fontes), n_linhas)
+            df = registrar("anexar_calendario", lambda: rb.anexar_calendario(df), n_linhas)
+
+    del bruto
+    rb._preparar_dimensoes(df)
+    ano = int(df["REQ_DATA"].dt.year.max())
+
+    registrar("_filtrar_basicos_ano", lambda: rb._filtrar_basicos_ano(df, ano), n_linhas)
+    registrar("preparar_contexto_basicos", lambda: rb.preparar_contexto_basicos(df, ano), n_linhas)
+
+    for nome, func in ANALISES:
+        registrar(nome, lambda func=func: func(df, ano), n_linhas)
+
+    painel = registrar("painel_recorrencia_basicos", lambda: rb.painel_recorrencia_basicos(df, ano), n_linhas)
+
+    df_mes = painel["basicos_reqs_mes"]
+    obra = df_mes["EMPRD"].iloc[0] if not df_mes.empty else None
+    plots = [
+        ("plot_top_itens_recorrencia_mensal", vis.plot_top_itens_recorrencia_mensal, df_mes, ()),
+        ("plot_recorrencia_mensal_por_obra", vis.plot_recorrencia_mensal_por_obra, df_mes, (obra,)),
+        ("plot_itens_reqs_subsequentes", vis.plot_itens_reqs_subsequentes,
+         painel["basicos_reqs_subsequentes"], ()),
+        ("plot_recorrencia_semanal_heatmap", vis.plot_recorrencia_semanal_heatmap,
+         painel["basicos_semanal_por_obra"], ()),
+        ("plot_intervalo_medio_scatter", vis.plot_intervalo_medio_scatter,
+         painel["intervalo_medio_entre_pedidos"], ()),
+        ("plot_itens_pingados", vis.plot_itens_pingados, painel["itens_pequena_qtd_alta_freq"], ()),
+    ]
+    for nome, plot_func, tabela, args in plots:
+        registrar(nome, _renderizar(plot_func, tabela, *args), len(tabela))
+
+    return registros
+
+
+def comparar(atual: list, referencia: list, tolerancia: float, minimo_s: float = 0.05) -> list:
+    """Etapas (linhas, etapa) mais lentas que `tolerancia` x a referência."""
+    ref = {(r["linhas"], r["etapa"]): r for r in referencia}
+    regressoes = []
+    for r in atual:
+        antes = ref.get((r["linhas"], r["etapa"]))
+        if antes is None:
+            continue
+        # Etapas muito rápidas oscilam demais para comparar
+        if max(r["segundos"], antes["segundos"]) < minimo_s:
+            continue
+        razao = r["segundos"] / max(antes["segundos"], 1e-9)
+        if razao > tolerancia:
+            regressoes.append({**r, "segundos_referencia": antes["segundos"], "razao": round(razao, 3)})
+    return regressoes
+
+
+def _meta() -> Dict[str, Any]:
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de escala do recorrencia_basicos")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--max-linhas-excel", type=int, default=MAX_LINHAS_EXCEL_PADRAO)
+    parser.add_argument("--saida", type=Path, default=Path("benchmarks") / "resultados.json")
+    parser.add_argument("--comparar", type=Path, help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    registros = []
+    for n in args.tamanhos:
+        registros += benchmark_tamanho(
+            n, args.seed, args.repeticoes, not args.sem_memoria, args.max_linhas_excel
+        )
+
+    saida = {
+        "meta": {**_meta(), "seed": args.seed, "repeticoes": args.repeticoes},
+        "resultados": registros,
+    }
+    args.saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(saida, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.comparar is not None:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)["resultados"]
+        regressoes = comparar(registros, referencia, args.tolerancia)
+        for r in regressoes:
+            print(
+                f"REGRESSÃO {r['linhas']:,} linhas / {r['etapa']}: "
+                f"{r['segundos_referencia']:.3f}s -> {r['segundos']:.3f}s ({r['razao']:.2f}x)"
+            )
+        if regressoes:
+            return 1
+        print("Sem regressões acima da tolerância.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
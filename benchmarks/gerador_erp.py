@@ -0,0 +1,135 @@
+# benchmarks/gerador_erp.py
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Limite de linhas de uma planilha do Excel (inclui o cabeçalho)
+XLSX_MAX_LINHAS = 1_048_576 - 1
+
+COLUNAS_ERP = [
+    "REQ_CDG", "REQ_DATA", "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
+    "QTD_PED", "OF_CDG", "OF_DATA", "FORNECEDOR_CDG",
+    "PRCTTL_INSUMO", "ITEM_PRCUNTPED", "TOTAL",
+]
+
+PALAVRAS_INSUMO = [
+    "CIMENTO", "AREIA", "BRITA", "PREGO", "ARAME", "TIJOLO", "BLOCO", "CAL",
+    "ARGAMASSA", "PARAFUSO", "LUVA", "DISCO", "FITA", "LIXA", "TUBO", "JOELHO",
+    "REGISTRO", "CABO", "TOMADA", "TINTA", "ROLO", "PINCEL", "MADEIRA", "TÁBUA",
+]
+PALAVRAS_OBRA = ["RESIDENCIAL", "EDIFÍCIO", "CONDOMÍNIO", "TORRE", "PARQUE", "VILLAGE"]
+
+
+def _texto(rng: np.random.Generator, palavras: list, n: int, prefixo: str = "") -> np.ndarray:
+    a = rng.choice(palavras, n)
+    b = rng.integers(1, 999, n).astype(str)
+    return np.char.add(np.char.add(np.char.add(prefixo, a), " "), b)
+
+
+def gerar_base_erp(
+    n_linhas: int,
+    seed: int = 0,
+    frac_basicos: float = 0.4,
+    n_obras: Optional[int] = None,
+    n_insumos: Optional[int] = None,
+    ano_inicio: int = 2023,
+    n_anos: int = 3,
+    itens_por_req: float = 4.0,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Base sintética no formato da Planilha1 de `total_indicadores.xlsx` e a
+    lista de códigos no formato da aba "Final" de `MateriaisBasicos.xlsx`.
+
+    - REQ_CDG cresce com a data (numeração do ERP), cada REQ pertence a uma
+      obra e tem em média `itens_por_req` itens;
+    - insumos seguem uma distribuição de popularidade (poucos itens muito
+      pedidos), `frac_basicos` dos códigos do catálogo são básicos;
+    - quantidades log-normais (muitos pedidos pequenos), ~1% de datas e
+      quantidades faltando, como no export real.
+
+    Mesma `seed` -> mesma base.
+    """
+    rng = np.random.default_rng(seed)
+    n_linhas = int(n_linhas)
+
+    n_obras = int(n_obras or max(10, int(n_linhas ** 0.5 / 4)))
+    n_insumos = int(n_insumos or max(200, int(n_linhas ** 0.5 * 2)))
+    n_reqs = max(1, int(n_linhas / itens_por_req))
+
+    # Catálogo de insumos (código no formato do ERP) e de obras
+    grupos = rng.integers(1, 60, n_insumos)
+    cod_insumo = np.char.add(
+        np.char.add(np.char.zfill(grupos.astype(str), 2), "."),
+        np.char.zfill(np.arange(n_insumos).astype(str), 5),
+    )
+    desc_insumo = _texto(rng, PALAVRAS_INSUMO, n_insumos)
+    eh_basico = rng.random(n_insumos) < float(frac_basicos)
+    popularidade = rng.pareto(1.2, n_insumos) + 1
+    popularidade /= popularidade.sum()
+
+    cod_obra = np.arange(100, 100 + n_obras)
+    desc_obra = _texto(rng, PALAVRAS_OBRA, n_obras, prefixo="OBRA ")
+    porte_obra = rng.gamma(2.0, 1.0, n_obras)
+    porte_obra /= porte_obra.sum()
+
+    # REQs: datas crescentes (dias úteis em maioria) e numeração sequencial
+    dias_periodo = 365 * int(n_anos)
+    dias = np.sort(rng.integers(0, dias_periodo, n_reqs))
+    req_data = pd.Timestamp(f"{int(ano_inicio)}-01-01") + pd.to_timedelta(dias, unit="D")
+    req_data = req_data + pd.to_timedelta(np.where(req_data.dayofweek >= 5, 2, 0), unit="D")
+    req_cdg = 10_000 + np.arange(n_reqs)
+    req_obra = rng.choice(n_obras, n_reqs, p=porte_obra)
+
+    # Linhas: cada uma é um item de uma REQ
+    linha_req = np.sort(rng.integers(0, n_reqs, n_linhas))
+    linha_insumo = rng.choice(n_insumos, n_linhas, p=popularidade)
+    obra = req_obra[linha_req]
+
+    qtd = np.round(rng.lognormal(1.5, 1.2, n_linhas), 0) + 1
+    preco = np.round(rng.lognormal(3.0, 1.0, n_linhas), 2)
+    of_cdg = 50_000 + linha_req // 3 + rng.integers(0, 2, n_linhas)
+    fornecedor = rng.integers(1, 5_000, n_linhas).astype(str)
+
+    df = pd.DataFrame({
+        "REQ_CDG": req_cdg[linha_req],
+        "REQ_DATA": req_data[linha_req],
+        "EMPRD": cod_obra[obra],
+        "EMPRD_DESC": desc_obra[obra],
+        "INSUMO_CDG": cod_insumo[linha_insumo],
+        "INSUMO_DESC": desc_insumo[linha_insumo],
+        "QTD_PED": qtd,
+        "OF_CDG": of_cdg,
+        "OF_DATA": req_data[linha_req] + pd.to_timedelta(rng.integers(1, 15, n_linhas), unit="D"),
+        "FORNECEDOR_CDG": fornecedor,
+        "PRCTTL_INSUMO": preco,
+        "ITEM_PRCUNTPED": preco,
+        "TOTAL": np.round(preco * qtd, 2),
+    }, columns=COLUNAS_ERP)
+
+    falta = rng.random(n_linhas)
+    df.loc[falta < 0.01, "REQ_DATA"] = pd.NaT
+    df.loc[(falta >= 0.01) & (falta < 0.02), "QTD_PED"] = np.nan
+
+    codigos = pd.DataFrame({"Código": cod_insumo[eh_basico]})
+    return df, codigos
+
+
+def gravar_planilhas(df: pd.DataFrame, codigos: pd.DataFrame, pasta: Path, gravar_erp: bool = True) -> Path:
+    """
+    Grava `MateriaisBasicos.xlsx` (aba "Final") e, se couber no Excel,
+    `total_indicadores.xlsx` (aba "Planilha1") em `pasta`.
+    """
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    codigos.to_excel(pasta / "MateriaisBasicos.xlsx", sheet_name="Final", index=False)
+
+    if gravar_erp:
+        if len(df) > XLSX_MAX_LINHAS:
+            raise ValueError(f"{len(df)} linhas não cabem numa planilha do Excel ({XLSX_MAX_LINHAS})")
+        df.to_excel(pasta / "total_indicadores.xlsx", sheet_name="Planilha1", index=False)
+
+    return pasta
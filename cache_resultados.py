@@ -0,0 +1,187 @@
+# cache_resultados.py
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from snapshot_bases import PASTA_SNAPSHOT
+
+# Subpasta (dentro da pasta dos snapshots) com um diretório por painel guardado
+PASTA_RESULTADOS = "resultados"
+ARQUIVO_VALORES = "valores.json"
+
+# Espaço em disco padrão para os painéis guardados
+ORCAMENTO_PADRAO_MB = 256
+
+# Incrementar quando o formato dos arquivos gravados mudar
+VERSAO_CACHE = 1
+
+# Código que define o conteúdo do painel: qualquer mudança nele invalida as entradas
+ARQUIVOS_CODIGO = [
+    "recorrencia_basicos.py",
+    "leitor_excel.py",
+    "snapshot_bases.py",
+    # Motores alternativos (`motor` / `n_particoes`) gravam sob a mesma chave
+    "motor_duckdb.py",
+    "particionamento_obras.py",
+]
+
+
+@lru_cache(maxsize=1)
+def versao_codigo() -> str:
+    """Hash do código das análises (calculado uma vez por processo)."""
+    h = hashlib.sha256(f"v{VERSAO_CACHE}".encode("ascii"))
+    for nome in ARQUIVOS_CODIGO:
+        h.update(nome.encode("utf-8"))
+        try:
+            h.update(Path(__file__).with_name(nome).read_bytes())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+def _data_iso(valor) -> Optional[str]:
+    return pd.Timestamp(valor).isoformat() if valor is not None else None
+
+
+def chave_resultado(
+    impressao: str,
+    ano: Optional[int],
+    inicio=None,
+    fim=None,
+    limiares: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> str:
+    """
+    Chave de um painel: impressão digital das planilhas de origem, período
+    (ano e janela [inicio, fim)), limiares e versão do código.
+    """
+    conteudo = json.dumps(
+        {
+            "fontes": impressao,
+            "ano": int(ano) if ano is not None else None,
+            "inicio": _data_iso(inicio),
+            "fim": _data_iso(fim),
+            "limiares": limiares or {},
+            "codigo": versao_codigo(),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:32]
+
+
+def _valor_json(valor):
+    # Escalares do numpy (ex.: contagens do resumo) viram tipos do Python
+    return valor.item() if hasattr(valor, "item") else str(valor)
+
+
+def _tamanho(pasta: Path) -> int:
+    return sum(p.stat().st_size for p in pasta.iterdir() if p.is_file())
+
+
+class CacheResultados:
+    """
+    Painéis (dict de tabelas + valores como o resumo) guardados em disco, um
+    diretório por chave: cada tabela num Feather e os demais valores em JSON.
+    Sobrevive a reinícios do processo.
+
+    Quando o total passa de `orcamento_mb`, as entradas usadas há mais tempo
+    são apagadas (LRU: o mtime do diretório marca o último acesso). Falhas
+    de leitura ou escrita só tornam a entrada ausente: o cache é um atalho.
+    """
+
+    def __init__(self, pasta: Path, orcamento_mb: float = ORCAMENTO_PADRAO_MB):
+        self.pasta = Path(pasta)
+        self.orcamento_bytes = int(orcamento_mb * 2 ** 20)
+        self._trava = threading.Lock()
+
+    def ler(self, chave: str) -> Optional[Dict[str, Any]]:
+        entrada = self.pasta / chave
+        try:
+            from pyarrow import feather
+
+            with open(entrada / ARQUIVO_VALORES, encoding="utf-8") as f:
+                meta = json.load(f)
+            painel = {
+                nome: feather.read_table(entrada / f"{nome}.feather").to_pandas()
+                for nome in meta["tabelas"]
+            }
+            os.utime(entrada)
+        except (ImportError, OSError, ValueError, KeyError):
+            return None
+
+        painel.update(meta["valores"])
+        return {k: painel[k] for k in meta["ordem"]}
+
+    def gravar(self, chave: str, painel: Dict[str, Any]) -> bool:
+        entrada = self.pasta / chave
+        tmp = self.pasta / f".{chave}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tabelas = {k: v for k, v in painel.items() if isinstance(v, pd.DataFrame)}
+
+        try:
+            tmp.mkdir(parents=True, exist_ok=True)
+            for nome, tabela in tabelas.items():
+                tabela.reset_index(drop=True).to_feather(tmp / f"{nome}.feather")
+            # JSON por último: entrada sem ele é tratada como ausente
+            with open(tmp / ARQUIVO_VALORES, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "ordem": list(painel),
+                        "tabelas": list(tabelas),
+                        "valores": {k: v for k, v in painel.items() if k not in tabelas},
+                    },
+                    f,
+                    ensure_ascii=False,
+                    default=_valor_json,
+                )
+            if entrada.exists():
+                # Outro processo/sessão gravou a mesma chave antes
+                shutil.rmtree(tmp, ignore_errors=True)
+            else:
+                os.replace(tmp, entrada)
+        except (ImportError, OSError, ValueError, TypeError):
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+
+        self.despejar()
+        return True
+
+    def _entradas(self) -> list:
+        entradas = []
+        for p in self.pasta.iterdir():
+            if p.is_dir() and not p.name.startswith("."):
+                entradas.append((p.stat().st_mtime_ns, _tamanho(p), p))
+        return entradas
+
+    def tamanho(self) -> int:
+        """Bytes ocupados pelas entradas."""
+        try:
+            return sum(t for _, t, _ in self._entradas())
+        except OSError:
+            return 0
+
+    def despejar(self) -> None:
+        """Apaga as entradas menos usadas até o total caber no orçamento."""
+        with self._trava:
+            try:
+                entradas = sorted(self._entradas())
+            except OSError:
+                return
+            total = sum(t for _, t, _ in entradas)
+            for _, tamanho, p in entradas:
+                if total <= self.orcamento_bytes:
+                    break
+                shutil.rmtree(p, ignore_errors=True)
+                total -= tamanho
+
+
+def cache_do_diretorio(base_dir: Path, orcamento_mb: float = ORCAMENTO_PADRAO_MB) -> CacheResultados:
+    """Cache de resultados ao lado do snapshot das planilhas de `base_dir`."""
+    return CacheResultados(Path(base_dir) / PASTA_SNAPSHOT / PASTA_RESULTADOS, orcamento_mb)
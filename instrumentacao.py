@@ -0,0 +1,194 @@
+# instrumentacao.py
+
+import contextvars
+import functools
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Any, Dict, List
+
+import pandas as pd
+
+logger = logging.getLogger("recorrencia")
+
+# Relatório ativo na thread/contexto atual (None = instrumentação desligada)
+_relatorio_ativo: contextvars.ContextVar = contextvars.ContextVar("relatorio_desempenho", default=None)
+
+# Etapas abertas no contexto atual (da mais externa para a mais interna). Uma
+# tarefa rodada numa cópia do contexto (contextvars.copy_context) começa com a
+# pilha de quem a submeteu: as etapas dela ficam aninhadas sob a etapa aberta
+_pilha_etapas: contextvars.ContextVar = contextvars.ContextVar("pilha_etapas", default=())
+
+
+@dataclass
+class Etapa:
+    """Uma execução medida: tempo de parede, linhas de entrada/saída e pico de memória."""
+    nome: str
+    nivel: int
+    segundos: float = 0.0
+    linhas_entrada: Optional[int] = None
+    linhas_saida: Optional[int] = None
+    pico_mem_mb: Optional[float] = None
+    # Pico absoluto do tracemalloc visto pelas sub-etapas (uso interno)
+    _pico_filhas: int = field(default=0, repr=False)
+
+
+class RelatorioDesempenho:
+    """
+    Coleta as etapas instrumentadas (`etapa` / `@instrumentar`) executadas
+    enquanto está ativo. Sem relatório ativo, a instrumentação não mede nada.
+
+    Uso:
+        with RelatorioDesempenho(memoria=True) as rel:
+            painel_recorrencia_basicos(df, 2025)
+        rel.tabela()          # DataFrame, uma linha por etapa (na ordem de início)
+        rel.registrar_log()   # uma linha de log por etapa
+
+    `memoria=True` liga o tracemalloc (pico de memória por etapa), que deixa
+    o código bem mais lento: use só para diagnóstico.
+
+    Etapas que rodam em threads entram no relatório quando a thread executa
+    numa cópia do contexto de quem a submeteu (`contextvars.copy_context().run`,
+    como em `painel_recorrencia_basicos(paralelo="thread")`); o pico de memória
+    é do processo inteiro, então com threads simultâneas ele é aproximado.
+    Etapas em outros processos não são medidas.
+    """
+
+    def __init__(self, memoria: bool = False):
+        self.memoria = memoria
+        self.etapas: List[Etapa] = []
+        self._trava = threading.Lock()
+        self._token = None
+        self._token_pilha = None
+        self._ligou_tracemalloc = False
+
+    # ---------------- ativação ----------------
+    def ativar(self) -> "RelatorioDesempenho":
+        self._token = _relatorio_ativo.set(self)
+        self._token_pilha = _pilha_etapas.set(())
+        if self.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._ligou_tracemalloc = True
+        return self
+
+    def desativar(self) -> None:
+        if self._token is not None:
+            _relatorio_ativo.reset(self._token)
+            _pilha_etapas.reset(self._token_pilha)
+            self._token = None
+            self._token_pilha = None
+        if self._ligou_tracemalloc:
+            tracemalloc.stop()
+            self._ligou_tracemalloc = False
+
+    def __enter__(self) -> "RelatorioDesempenho":
+        return self.ativar()
+
+    def __exit__(self, *exc) -> None:
+        self.desativar()
+
+    # ---------------- saída ----------------
+    def como_dicts(self) -> List[Dict[str, Any]]:
+        return [
+            {k: v for k, v in asdict(e).items() if not k.startswith("_")}
+            for e in self.etapas
+        ]
+
+    def tabela(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.como_dicts(),
+            columns=["nome", "nivel", "segundos", "linhas_entrada", "linhas_saida", "pico_mem_mb"],
+        )
+
+    def registrar_log(self, log: Optional[logging.Logger] = None, nivel: int = logging.INFO) -> None:
+        log = log or logger
+        for e in self.etapas:
+            pico = f" pico={e.pico_mem_mb:.1f}MB" if e.pico_mem_mb is not None else ""
+            log.log(
+                nivel,
+                "%s%s %.3fs linhas=%s->%s%s",
+                "  " * e.nivel, e.nome, e.segundos, e.linhas_entrada, e.linhas_saida, pico,
+            )
+
+
+def relatorio_ativo() -> Optional[RelatorioDesempenho]:
+    return _relatorio_ativo.get()
+
+
+def contar_linhas(obj: Any) -> Optional[int]:
+    """Linhas de um DataFrame, de um contexto (atributo `base`) ou de um dict de tabelas."""
+    if isinstance(obj, pd.DataFrame):
+        return int(len(obj))
+    base = getattr(obj, "base", None)
+    if isinstance(base, pd.DataFrame):
+        return int(len(base))
+    if isinstance(obj, dict):
+        tabelas = [t for t in obj.values() if isinstance(t, pd.DataFrame)]
+        return int(sum(len(t) for t in tabelas)) if tabelas else None
+    return None
+
+
+@contextmanager
+def etapa(nome: str, linhas_entrada: Optional[int] = None):
+    """
+    Mede o bloco como uma etapa do relatório ativo. Devolve a `Etapa` (ou
+    None sem relatório), onde o bloco pode preencher `linhas_saida`.
+    """
+    rel = _relatorio_ativo.get()
+    if rel is None:
+        yield None
+        return
+
+    pilha = _pilha_etapas.get()
+    e = Etapa(nome=nome, nivel=len(pilha), linhas_entrada=linhas_entrada)
+    with rel._trava:
+        rel.etapas.append(e)
+    token_pilha = _pilha_etapas.set(pilha + (e,))
+
+    medir_mem = rel.memoria and tracemalloc.is_tracing()
+    if medir_mem:
+        mem_inicio = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    t0 = time.perf_counter()
+    try:
+        yield e
+    finally:
+        e.segundos = time.perf_counter() - t0
+        _pilha_etapas.reset(token_pilha)
+
+        if medir_mem:
+            # reset_peak das sub-etapas apaga o pico delas: usa o maior entre
+            # o pico atual e o que elas repassaram
+            pico_abs = max(tracemalloc.get_traced_memory()[1], e._pico_filhas)
+            e.pico_mem_mb = max(pico_abs - mem_inicio, 0) / 2 ** 20
+            if pilha:
+                pai = pilha[-1]
+                with rel._trava:
+                    pai._pico_filhas = max(pai._pico_filhas, pico_abs)
+
+
+def instrumentar(nome: Optional[str] = None):
+    """
+    Decorador: cada chamada vira uma etapa do relatório ativo, com as linhas
+    do 1º argumento (DataFrame/contexto) e do resultado.
+    """
+    def decorador(func):
+        rotulo = nome or func.__name__
+
+        @functools.wraps(func)
+        def envolvida(*args, **kwargs):
+            if _relatorio_ativo.get() is None:
+                return func(*args, **kwargs)
+
+            with etapa(rotulo, contar_linhas(args[0]) if args else None) as e:
+                resultado = func(*args, **kwargs)
+                e.linhas_saida = contar_linhas(resultado)
+            return resultado
+
+        return envolvida
+
+    return decorador
@@ -0,0 +1,163 @@
+# leitor_excel.py
+
+from pathlib import Path
+from typing import Optional, Dict, Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+# Linhas convertidas por vez: o pico de memória depende disso e do nº de
+# colunas projetadas, não do tamanho nem da largura da planilha
+TAMANHO_BLOCO = 50_000
+
+
+def _abrir_aba(caminho: Path, aba: str):
+    from openpyxl import load_workbook
+
+    # Mesmo modo do pd.read_excel: somente leitura, valores (não fórmulas)
+    wb = load_workbook(caminho, read_only=True, data_only=True, keep_links=False)
+    ws = wb[aba]
+    ws.reset_dimensions()
+    return wb, ws
+
+
+def _converter_celula(valor):
+    """Mesma conversão de célula do leitor openpyxl do pandas (ver pandas.io.excel._openpyxl)."""
+    from openpyxl.cell.cell import ERROR_CODES
+
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, (int, float)):
+        inteiro = int(valor) if np.isfinite(valor) else None
+        return inteiro if inteiro == valor else float(valor)
+    if isinstance(valor, str) and valor in ERROR_CODES:
+        return np.nan
+    return valor
+
+
+def _linhas_projetadas(ws, posicoes: List[int]) -> Iterator[list]:
+    """
+    Linhas de dados (sem o cabeçalho) só com as colunas em `posicoes`.
+    Linhas vazias no fim da aba são descartadas, como no pd.read_excel.
+    """
+    vazias_pendentes = []
+    linhas = ws.iter_rows(values_only=True)
+    next(linhas, None)
+
+    for linha in linhas:
+        n = len(linha)
+        projetada = [_converter_celula(linha[i]) if i < n else "" for i in posicoes]
+
+        # "Vazia" olhando a linha inteira, não só as colunas projetadas
+        if any(v is not None for v in linha):
+            for p in vazias_pendentes:
+                yield p
+            vazias_pendentes = []
+            yield projetada
+        else:
+            vazias_pendentes.append(projetada)
+
+
+def _blocos(linhas: Iterable[list], tamanho: int) -> Iterator[List[list]]:
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _parse(cabecalho: list, linhas: List[list], dtype: Optional[Dict[str, str]]) -> pd.DataFrame:
+    # O mesmo parser (e a mesma inferência de tipos) usado pelo pd.read_excel
+    return TextParser(
+        [cabecalho] + linhas,
+        header=0,
+        dtype=dtype,
+        skip_blank_lines=False,
+    ).read()
+
+
+def _tipo_numerico(serie: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(serie.dtype) and not pd.api.types.is_bool_dtype(serie.dtype)
+
+
+def _juntar_blocos(partes: List[pd.DataFrame]) -> tuple:
+    """
+    Concatena os blocos. Um bloco só com vazios vira NaN do tipo dos demais
+    (no arquivo inteiro a coluna teria sido inferida junto). Devolve também
+    as colunas em que um bloco saiu numérico e outro texto: nelas a inferência
+    por bloco pode divergir da inferência da coluna inteira.
+    """
+    if len(partes) == 1:
+        return partes[0], []
+
+    conflitos = []
+    for col in partes[0].columns:
+        cheias = [p[col] for p in partes if p[col].notna().any()]
+        if not cheias:
+            continue
+
+        numericas = [_tipo_numerico(s) for s in cheias]
+        if any(numericas) and not all(numericas):
+            conflitos.append(col)
+            continue
+
+        alvo = cheias[0].dtype
+        if pd.api.types.is_integer_dtype(alvo):
+            alvo = np.float64
+        for p in partes:
+            if not p[col].notna().any() and p[col].dtype != alvo:
+                p[col] = p[col].astype(alvo)
+
+    return pd.concat(partes, ignore_index=True), conflitos
+
+
+def ler_excel_colunas(
+    caminho: Path,
+    aba: str,
+    colunas: Optional[Iterable[str]] = None,
+    dtype: Optional[Dict[str, str]] = None,
+    tamanho_bloco: int = TAMANHO_BLOCO,
+) -> pd.DataFrame:
+    """
+    Lê uma aba em streaming (openpyxl read-only), guardando só as `colunas`
+    pedidas (None = todas) e convertendo os tipos a cada `tamanho_bloco`
+    linhas. Resultado igual ao de `pd.read_excel(caminho, sheet_name=aba,
+    usecols=colunas, dtype=dtype)`, sem montar a planilha inteira em memória.
+
+    Colunas pedidas que não existem na planilha são ignoradas.
+    """
+    wb, ws = _abrir_aba(Path(caminho), aba)
+    try:
+        cabecalho_todo = [_converter_celula(v) for v in next(ws.iter_rows(max_row=1, values_only=True), ())]
+        if colunas is None:
+            posicoes = list(range(len(cabecalho_todo)))
+        else:
+            pedidas = set(colunas)
+            posicoes = [i for i, nome in enumerate(cabecalho_todo) if nome in pedidas]
+        cabecalho = [cabecalho_todo[i] for i in posicoes]
+
+        tipos = {c: t for c, t in (dtype or {}).items() if c in cabecalho} or None
+        partes = [
+            _parse(cabecalho, bloco, tipos)
+            for bloco in _blocos(_linhas_projetadas(ws, posicoes), tamanho_bloco)
+        ]
+    finally:
+        wb.close()
+
+    if not partes:
+        return _parse(cabecalho, [], tipos)
+
+    df, conflitos = _juntar_blocos(partes)
+    if conflitos:
+        # Raro: relê só essas colunas e infere o tipo com a coluna inteira
+        inteiras = ler_excel_colunas(caminho, aba, conflitos, dtype, tamanho_bloco=len(df) + 1)
+        for col in conflitos:
+            df[col] = inteiras[col]
+
+    return df
@@ -0,0 +1,415 @@
+# motor_duckdb.py
+
+from pathlib import Path
+from typing import Optional, Dict, Any, Union
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import instrumentar
+from recorrencia_basicos import (
+    ANALISES_PAINEL,
+    CHAVES_SAIDA,
+    COLS_INTERVALO,
+    COLS_PINGADOS,
+    COLS_REQS_MES,
+    COLS_REQS_SUBSEQ,
+    COLS_SEMANAL,
+    COLUNAS_ANALISE,
+    ContextoBasicos,
+    DataJanela,
+    _anexar_nomes,
+    _filtrar_pingados,
+    _limites_janela,
+    limiares_painel,
+    _mapa_empr_desc,
+    _mapa_insumo_desc,
+    _nomes_insumos,
+    _nomes_obras,
+    _ordenar_saida,
+    _resumo_indicadores,
+)
+from snapshot_bases import PASTA_SNAPSHOT, ARQUIVO_SNAPSHOT
+
+# Colunas que as consultas leem da fonte (o resto nem sai do disco)
+COLUNAS_FONTE = COLUNAS_ANALISE
+
+
+# ============================================================
+# Fonte: snapshot Feather (memory-map) ou DataFrame já carregado
+# ============================================================
+def caminho_snapshot(diretorio: Union[str, Path]) -> Path:
+    """Feather gravado por carregar_bases dentro da pasta das planilhas."""
+    return Path(diretorio) / PASTA_SNAPSHOT / ARQUIVO_SNAPSHOT
+
+
+class FonteDuckDB:
+    """
+    Conexão DuckDB com a base registrada como a tabela `fonte` (Arrow), mais
+    o que o lado pandas precisa para devolver tabelas idênticas às do motor
+    pandas: dimensões de nomes e dtypes das colunas-chave.
+
+    A fonte ganha a coluna _LINHA (posição original da linha): onde o pandas
+    usa "primeira ocorrência" (drop_duplicates), a consulta usa arg_min(_, _LINHA).
+    """
+
+    def __init__(self, fonte: Union[pd.DataFrame, str, Path]):
+        import duckdb
+        import pyarrow as pa
+
+        if isinstance(fonte, pd.DataFrame):
+            cols = [c for c in fonte.columns if c in COLUNAS_FONTE]
+            tabela = pa.Table.from_pandas(fonte[cols], preserve_index=False)
+            tipos = fonte[cols].dtypes.to_dict()
+            self.nomes_empr = _nomes_obras(fonte)
+            self.nomes_insumo = _nomes_insumos(fonte)
+        else:
+            from pyarrow import feather
+
+            # Memory-map: só as páginas das colunas lidas pelas consultas vão à memória
+            tabela = feather.read_table(Path(fonte), memory_map=True)
+            tabela = tabela.select([c for c in tabela.column_names if c in COLUNAS_FONTE])
+            self.nomes_empr, self.nomes_insumo = self._dimensoes(tabela)
+            tipos = tabela.slice(0, 0).to_pandas().dtypes.to_dict()
+
+        if not pa.types.is_timestamp(tabela.schema.field("REQ_DATA").type):
+            raise ValueError("motor duckdb: REQ_DATA precisa estar convertida para data (use carregar_bases)")
+
+        self.colunas = tabela.column_names
+        self.tipos = tipos
+
+        tabela = tabela.append_column("_LINHA", pa.array(np.arange(tabela.num_rows, dtype=np.int64)))
+        self.con = duckdb.connect()
+        self.con.register("fonte", tabela)
+
+    @staticmethod
+    def _dimensoes(tabela):
+        # Só as colunas de código/descrição, com o mesmo helper do pandas
+        def dim(chave, desc, mapa):
+            cols = [c for c in (chave, desc) if c in tabela.column_names]
+            d = tabela.select(cols).to_pandas()
+            return mapa(d).set_index(chave)[desc]
+
+        return (
+            dim("EMPRD", "EMPRD_DESC", _mapa_empr_desc),
+            dim("INSUMO_CDG", "INSUMO_DESC", _mapa_insumo_desc),
+        )
+
+    def contexto(self, ano: Optional[int]) -> ContextoBasicos:
+        # Contexto "vazio" só com as dimensões, para _anexar_nomes
+        return ContextoBasicos(
+            base=pd.DataFrame(), ano=ano,
+            nomes_empr=self.nomes_empr, nomes_insumo=self.nomes_insumo,
+        )
+
+    def consultar(self, sql: str, parametros: Optional[dict] = None) -> pd.DataFrame:
+        out = self.con.execute(sql, parametros or {}).fetch_df()
+        # Chaves com o mesmo dtype da base (ex.: str, categórica da base compacta)
+        for c in ("EMPRD", "INSUMO_CDG", "INSUMO_DESC"):
+            if c in out.columns and c in self.tipos:
+                out[c] = out[c].astype(self.tipos[c])
+        return out
+
+    def fechar(self) -> None:
+        self.con.close()
+
+
+# ============================================================
+# Básicos do período (filtro empurrado para a leitura da fonte)
+# ============================================================
+def _cte_basicos(fonte: FonteDuckDB, ano: Optional[int], inicio: DataJanela = None, fim: DataJanela = None) -> str:
+    filtros = ["REQ_DATA IS NOT NULL"]
+    if "TIPO_MATERIAL" in fonte.colunas:
+        filtros.append("upper(CAST(TIPO_MATERIAL AS VARCHAR)) = 'BÁSICO'")
+    if ano is not None:
+        filtros.append("year(REQ_DATA) = $ano")
+    if inicio is not None:
+        filtros.append("REQ_DATA >= $inicio")
+    if fim is not None:
+        filtros.append("REQ_DATA < $fim")
+
+    return f"""
+    base AS (
+        SELECT
+            _LINHA, REQ_CDG, EMPRD, INSUMO_CDG, INSUMO_DESC, QTD_PED, OF_CDG,
+            strftime(REQ_DATA, '%Y-%m')                     AS ANO_MES,
+            CAST(REQ_DATA AS DATE) - DATE '1970-01-01'      AS DIA,
+            isoyear(REQ_DATA)                               AS ANO_ISO,
+            -- semanas contínuas de segunda a domingo (1970-01-01 foi uma quinta)
+            floor((CAST(REQ_DATA AS DATE) - DATE '1970-01-01' + 3) / 7)::BIGINT AS SEMANA_IDX
+        FROM fonte
+        WHERE {" AND ".join(filtros)}
+    )"""
+
+
+def _cte_ilhas(origem: str) -> str:
+    """
+    Sequências de valores inteiros consecutivos por (EMPRD, INSUMO_CDG) a
+    partir de `origem` (colunas EMPRD, INSUMO_CDG, V distintos): valor menos
+    posição é constante dentro de cada sequência.
+    """
+    return f"""
+    ilhas AS (
+        SELECT EMPRD, INSUMO_CDG, count(*) AS TAM
+        FROM (
+            SELECT EMPRD, INSUMO_CDG,
+                   V - row_number() OVER (PARTITION BY EMPRD, INSUMO_CDG ORDER BY V) AS ILHA
+            FROM {origem}
+        )
+        GROUP BY EMPRD, INSUMO_CDG, ILHA
+    ),
+    seq AS (
+        SELECT EMPRD, INSUMO_CDG,
+               sum(TAM)::BIGINT      AS N_VALORES,
+               sum(TAM - 1)::BIGINT  AS N_LIGACOES,
+               max(TAM)::BIGINT      AS MAX_SEQ
+        FROM ilhas
+        GROUP BY EMPRD, INSUMO_CDG
+    )"""
+
+
+def _parametros(ano: Optional[int], inicio: DataJanela = None, fim: DataJanela = None, **outros) -> dict:
+    p = dict(outros)
+    if ano is not None:
+        p["ano"] = int(ano)
+    if inicio is not None:
+        p["inicio"] = pd.Timestamp(inicio).to_pydatetime()
+    if fim is not None:
+        p["fim"] = pd.Timestamp(fim).to_pydatetime()
+    return p
+
+
+def _finalizar(fonte: FonteDuckDB, out: pd.DataFrame, tabela: str, colunas: list, ano: Optional[int]) -> pd.DataFrame:
+    if out.empty:
+        return pd.DataFrame(columns=colunas)
+
+    # Mesma ordem de linhas do pandas: chaves do groupby, depois ordenação final estável
+    out = out.sort_values(CHAVES_SAIDA[tabela], kind="stable")
+    if "EMPRD_DESC" in colunas:
+        out = _anexar_nomes(out, fonte.contexto(ano))
+    return _ordenar_saida(out[colunas], tabela, [])
+
+
+# ============================================================
+# Análises
+# ============================================================
+@instrumentar("basicos_reqs_mes[duckdb]")
+def basicos_reqs_mes_duckdb(
+    fonte: FonteDuckDB,
+    ano: Optional[int] = None,
+    min_reqs_mes: int = 1,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> pd.DataFrame:
+    sql = f"""
+    WITH {_cte_basicos(fonte, ano, inicio, fim)},
+    dedup AS (
+        SELECT EMPRD, REQ_CDG, INSUMO_CDG, arg_min(ANO_MES, _LINHA) AS ANO_MES
+        FROM base
+        WHERE EMPRD IS NOT NULL AND REQ_CDG IS NOT NULL AND INSUMO_CDG IS NOT NULL
+        GROUP BY EMPRD, REQ_CDG, INSUMO_CDG
+    )
+    SELECT EMPRD, ANO_MES, INSUMO_CDG, count(DISTINCT REQ_CDG)::BIGINT AS QTD_REQS_MES
+    FROM dedup
+    GROUP BY EMPRD, ANO_MES, INSUMO_CDG
+    HAVING count(DISTINCT REQ_CDG) >= $minimo
+    """
+    out = fonte.consultar(sql, _parametros(ano, inicio, fim, minimo=int(min_reqs_mes)))
+    return _finalizar(fonte, out, "basicos_reqs_mes", COLS_REQS_MES, ano)
+
+
+@instrumentar("basicos_reqs_subsequentes[duckdb]")
+def basicos_reqs_subsequentes_duckdb(
+    fonte: FonteDuckDB,
+    ano: Optional[int] = None,
+    min_ligacoes: int = 1,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> pd.DataFrame:
+    # Ordem da REQ na obra pelo REQ_CDG numérico; cada REQ vira um inteiro 0, 1, 2...
+    sql = f"""
+    WITH {_cte_basicos(fonte, ano, inicio, fim)},
+    b AS (
+        SELECT EMPRD, INSUMO_CDG, TRY_CAST(REQ_CDG AS DOUBLE) AS REQ
+        FROM base
+        WHERE EMPRD IS NOT NULL AND INSUMO_CDG IS NOT NULL
+          AND TRY_CAST(REQ_CDG AS DOUBLE) IS NOT NULL
+    ),
+    reqs AS (
+        SELECT EMPRD, REQ, row_number() OVER (PARTITION BY EMPRD ORDER BY REQ) - 1 AS ORD
+        FROM (SELECT DISTINCT EMPRD, REQ FROM b)
+    ),
+    pares AS (
+        SELECT DISTINCT b.EMPRD, b.INSUMO_CDG, reqs.ORD AS V
+        FROM b JOIN reqs ON b.EMPRD = reqs.EMPRD AND b.REQ = reqs.REQ
+    ),
+    {_cte_ilhas("pares")}
+    SELECT EMPRD, INSUMO_CDG,
+           N_VALORES  AS TOTAL_REQS_ITEM,
+           N_LIGACOES AS N_LIGACOES_SUBSEQ,
+           MAX_SEQ    AS MAX_SEQ_SUBSEQ
+    FROM seq
+    WHERE N_VALORES >= 2 AND N_LIGACOES >= $minimo
+    """
+    out = fonte.consultar(sql, _parametros(ano, inicio, fim, minimo=int(min_ligacoes)))
+    return _finalizar(fonte, out, "basicos_reqs_subsequentes", COLS_REQS_SUBSEQ, ano)
+
+
+@instrumentar("basicos_semanal_por_obra[duckdb]")
+def basicos_semanal_por_obra_duckdb(
+    fonte: FonteDuckDB,
+    ano: Optional[int] = None,
+    min_semanas: int = 4,
+    exigir_consecutivas: bool = False,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> pd.DataFrame:
+    # Semanas do ano ISO pedido, como no pandas (com janela, vale a janela)
+    com_janela = inicio is not None or fim is not None
+    filtro_ano = "AND ANO_ISO = $ano" if ano is not None and not com_janela else ""
+    criterio = "MAX_SEQ" if exigir_consecutivas else "N_VALORES"
+    sql = f"""
+    WITH {_cte_basicos(fonte, ano, inicio, fim)},
+    semanas AS (
+        SELECT DISTINCT EMPRD, INSUMO_CDG, SEMANA_IDX AS V
+        FROM base
+        WHERE EMPRD IS NOT NULL AND INSUMO_CDG IS NOT NULL {filtro_ano}
+    ),
+    {_cte_ilhas("semanas")}
+    SELECT EMPRD, INSUMO_CDG,
+           N_VALORES AS SEMANAS_DISTINTAS,
+           MAX_SEQ   AS MAX_SEQ_SEMANAS
+    FROM seq
+    WHERE {criterio} >= $minimo
+    """
+    out = fonte.consultar(sql, _parametros(ano, inicio, fim, minimo=int(min_semanas)))
+    return _finalizar(fonte, out, "basicos_semanal_por_obra", COLS_SEMANAL, ano)
+
+
+@instrumentar("intervalo_medio_entre_pedidos[duckdb]")
+def intervalo_medio_entre_pedidos_duckdb(
+    fonte: FonteDuckDB,
+    ano: Optional[int] = None,
+    min_reqs: int = 2,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> pd.DataFrame:
+    sql = f"""
+    WITH {_cte_basicos(fonte, ano, inicio, fim)},
+    reqs AS (
+        SELECT EMPRD, INSUMO_CDG, REQ_CDG, arg_min(DIA, _LINHA) AS DIA
+        FROM base
+        WHERE EMPRD IS NOT NULL AND INSUMO_CDG IS NOT NULL AND REQ_CDG IS NOT NULL
+        GROUP BY EMPRD, INSUMO_CDG, REQ_CDG
+    ),
+    dias AS (
+        SELECT EMPRD, INSUMO_CDG, DIA,
+               DIA - lag(DIA) OVER (PARTITION BY EMPRD, INSUMO_CDG ORDER BY DIA) AS DIFF
+        FROM (SELECT DISTINCT EMPRD, INSUMO_CDG, DIA FROM reqs)
+    )
+    SELECT EMPRD, INSUMO_CDG,
+           count(*)::BIGINT                            AS TOTAL_REQS_ITEM,
+           (max(DIA) - min(DIA)) / (count(*) - 1)      AS INTERVALO_MEDIO_DIAS,
+           min(DIFF)::BIGINT                           AS INTERVALO_MIN_DIAS,
+           max(DIFF)::BIGINT                           AS INTERVALO_MAX_DIAS
+    FROM dias
+    GROUP BY EMPRD, INSUMO_CDG
+    HAVING count(*) >= $minimo
+    """
+    out = fonte.consultar(sql, _parametros(ano, inicio, fim, minimo=max(int(min_reqs), 2)))
+    # Arredondamento no pandas (o round do SQL não é o "half to even" do numpy)
+    out["INTERVALO_MEDIO_DIAS"] = out["INTERVALO_MEDIO_DIAS"].astype(np.float64).round(2)
+    return _finalizar(fonte, out, "intervalo_medio_entre_pedidos", COLS_INTERVALO, ano)
+
+
+@instrumentar("itens_pequena_qtd_alta_freq[duckdb]")
+def itens_basicos_pequenas_qtds_alta_frequencia_duckdb(
+    fonte: FonteDuckDB,
+    ano: Optional[int] = None,
+    min_pedidos: int = 5,
+    max_media_qtd: float = 10.0,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> pd.DataFrame:
+    # fsum em ordem de linha = mesma soma compensada (Kahan) do groupby do pandas
+    sql = f"""
+    WITH {_cte_basicos(fonte, ano, inicio, fim)},
+    q AS (
+        SELECT _LINHA, INSUMO_CDG, INSUMO_DESC, REQ_CDG, OF_CDG,
+               TRY_CAST(QTD_PED AS DOUBLE) AS QTD
+        FROM base
+        WHERE INSUMO_CDG IS NOT NULL AND INSUMO_DESC IS NOT NULL
+          AND TRY_CAST(QTD_PED AS DOUBLE) IS NOT NULL AND NOT isnan(TRY_CAST(QTD_PED AS DOUBLE))
+    ),
+    g AS (
+        SELECT INSUMO_CDG, INSUMO_DESC,
+               count(REQ_CDG)::BIGINT            AS pedidos,
+               fsum(QTD ORDER BY _LINHA)         AS qtd_total,
+               count(QTD)                        AS n_qtd,
+               count(DISTINCT OF_CDG)::BIGINT    AS vezes_distintas
+        FROM q
+        GROUP BY INSUMO_CDG, INSUMO_DESC
+    )
+    SELECT INSUMO_CDG, INSUMO_DESC, pedidos, qtd_total / n_qtd AS media_qtd, qtd_total, vezes_distintas
+    FROM g
+    WHERE pedidos >= $min_pedidos AND qtd_total / n_qtd <= $max_media
+    """
+    out = fonte.consultar(
+        sql, _parametros(ano, inicio, fim, min_pedidos=int(min_pedidos), max_media=float(max_media_qtd))
+    )
+    if out.empty:
+        return pd.DataFrame(columns=COLS_PINGADOS)
+
+    out = out.sort_values(CHAVES_SAIDA["itens_pequena_qtd_alta_freq"], kind="stable")
+    return _filtrar_pingados(out[COLS_PINGADOS], min_pedidos, max_media_qtd, [])
+
+
+ANALISES_DUCKDB = {
+    "basicos_reqs_mes": basicos_reqs_mes_duckdb,
+    "basicos_reqs_subsequentes": basicos_reqs_subsequentes_duckdb,
+    "basicos_semanal_por_obra": basicos_semanal_por_obra_duckdb,
+    "intervalo_medio_entre_pedidos": intervalo_medio_entre_pedidos_duckdb,
+    "itens_pequena_qtd_alta_freq": itens_basicos_pequenas_qtds_alta_frequencia_duckdb,
+}
+
+
+def painel_recorrencia_basicos_duckdb(
+    fonte: Union[pd.DataFrame, str, Path, FonteDuckDB],
+    ano: Optional[int] = 2025,
+    inicio: DataJanela = None,
+    fim: DataJanela = None,
+    limiares: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Mesmo resultado de `painel_recorrencia_basicos`, calculado por consultas
+    DuckDB (window functions) sobre a base em Arrow. `fonte` pode ser:
+      - o caminho do snapshot Feather (ver `caminho_snapshot`): lido por
+        memory-map, sem carregar a base no pandas;
+      - o DataFrame de carregar_bases;
+      - uma FonteDuckDB já aberta (reaproveitada entre anos).
+
+    `inicio` / `fim`: janela [inicio, fim) de REQ_DATA, como no pandas.
+
+    Filtro de básicos/período, deduplicações e agregações rodam no DuckDB; só as
+    tabelas finais chegam ao pandas, onde recebem os nomes e a ordenação dos
+    helpers do motor pandas.
+    """
+    propria = not isinstance(fonte, FonteDuckDB)
+    fonte_db = FonteDuckDB(fonte) if propria else fonte
+    ano = int(ano) if ano is not None else None
+    inicio, fim = _limites_janela(inicio, fim)
+    limiares = limiares_painel(limiares)
+
+    try:
+        tabelas = {
+            chave: ANALISES_DUCKDB[chave](fonte_db, ano, inicio=inicio, fim=fim, **limiares[chave])
+            for chave, _, _ in ANALISES_PAINEL
+        }
+    finally:
+        if propria:
+            fonte_db.fechar()
+
+    return {
+        **tabelas,
+        "resumo_indicadores": _resumo_indicadores(ano, tabelas),
+    }
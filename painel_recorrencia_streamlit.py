@@ -5,8 +5,17 @@ import pandas as pd
 
 from recorrencia_basicos import (
     carregar_bases,
-    painel_recorrencia_basicos,
+    preparar_contexto_basicos,
+    estatisticas_analise,
+    filtrar_analise,
+    fatia_do_ano,
+    get_base_dir,
+    impressao_digital_bases,
+    limiares_painel,
+    LIMIARES_PADRAO,
+    PainelPreguicoso,
 )
+from cache_resultados import cache_do_diretorio, chave_resultado
 from visualizacoes_recorrencia import (
     plot_top_itens_recorrencia_mensal,
     plot_recorrencia_mensal_por_obra,
@@ -14,7 +23,9 @@ from visualizacoes_recorrencia import (
     plot_recorrencia_semanal_heatmap,
     plot_intervalo_medio_scatter,
     plot_itens_pingados,
+    figura_bytes,
 )
+from instrumentacao import RelatorioDesempenho
 
 
 st.set_page_config(
@@ -27,11 +38,66 @@ st.title("📦 Recorrência de Materiais Básicos")
 st.caption("Análise de padrões de consumo por obra, item e tempo.")
 
 
-@st.cache_data
-def carregar_painel(ano: int):
-    df = carregar_bases()
-    painel = painel_recorrencia_basicos(df, ano=ano)
-    return df, painel
+# Os recursos abaixo recebem a impressão digital das planilhas: quando o
+# Excel muda, a base é recarregada em vez de seguir com a cópia antiga (e um
+# painel calculado com dados antigos nunca é gravado com a chave nova)
+@st.cache_resource(max_entries=1)
+def carregar_base_compartilhada(impressao: str):
+    # Base do ERP: uma única cópia por processo, compartilhada por todas as
+    # sessões e anos (somente leitura, não é serializada pelo cache)
+    return carregar_bases()
+
+
+@st.cache_resource(max_entries=1)
+def carregar_contexto_todos_anos(impressao: str):
+    # Filtro de básicos e colunas de calendário de todos os anos, uma vez por base
+    return preparar_contexto_basicos(carregar_base_compartilhada(impressao), None)
+
+
+@st.cache_resource(max_entries=5)
+def carregar_estatisticas_todos_anos(impressao: str, chave: str):
+    # Estatísticas (sem limiar) de cada tabela para todos os anos numa única
+    # passada, só quando alguma aba a pede pela primeira vez
+    return estatisticas_analise(carregar_contexto_todos_anos(impressao), chave, por_ano=True)
+
+
+@st.cache_data(max_entries=160)
+def carregar_estatisticas_do_ano(impressao: str, ano: int, chave: str):
+    # Trocar de ano só recorta as estatísticas já calculadas (não relê o Excel nem reagrupa)
+    return fatia_do_ano(carregar_estatisticas_todos_anos(impressao, chave), ano)
+
+
+@st.cache_resource
+def cache_paineis():
+    # Painéis já calculados, em disco: sobrevivem a reinícios e redeploys do servidor
+    return cache_do_diretorio(get_base_dir())
+
+
+class _PainelAusente(Exception):
+    pass
+
+
+@st.cache_resource(max_entries=20)
+def _painel_do_disco(chave_disco: str):
+    # Painel salvo, lido do disco uma vez por processo (somente leitura,
+    # compartilhado pelas sessões). Ausência vira exceção para não ser guardada:
+    # depois do `gravar` a próxima execução encontra o painel
+    painel = cache_paineis().ler(chave_disco)
+    if painel is None:
+        raise _PainelAusente(chave_disco)
+    return painel
+
+
+def ler_painel_salvo(chave_disco: str):
+    try:
+        return _painel_do_disco(chave_disco)
+    except _PainelAusente:
+        return None
+
+
+def tabela_do_ano(impressao: str, ano: int, chave: str, limiares: dict):
+    # Mudar um limiar só refiltra as estatísticas do ano (milissegundos)
+    return filtrar_analise(chave, carregar_estatisticas_do_ano(impressao, ano, chave), **limiares[chave])
 
 
 # ---------------- Barra lateral ----------------
@@ -39,176 +105,247 @@ st.sidebar.header("Filtros")
 
 ano = st.sidebar.number_input("Ano da análise", min_value=2015, max_value=2100, value=2025, step=1)
 
-df_erp, painel = carregar_painel(ano)
+with st.sidebar.expander("Limiares das análises"):
+    padrao = LIMIARES_PADRAO
+    limiares = {
+        "basicos_reqs_mes": {
+            "min_reqs_mes": st.slider(
+                "Mín. de REQs do item no mesmo mês", 1, 10,
+                padrao["basicos_reqs_mes"]["min_reqs_mes"],
+            ),
+        },
+        "basicos_reqs_subsequentes": {
+            "min_ligacoes": st.slider(
+                "Mín. de ligações entre REQs subsequentes", 0, 10,
+                padrao["basicos_reqs_subsequentes"]["min_ligacoes"],
+            ),
+        },
+        "basicos_semanal_por_obra": {
+            "min_semanas": st.slider(
+                "Mín. de semanas com o item", 1, 26,
+                padrao["basicos_semanal_por_obra"]["min_semanas"],
+            ),
+            "exigir_consecutivas": st.checkbox(
+                "Exigir semanas consecutivas",
+                padrao["basicos_semanal_por_obra"]["exigir_consecutivas"],
+            ),
+        },
+        "intervalo_medio_entre_pedidos": {
+            "min_reqs": st.slider(
+                "Mín. de REQs para calcular o intervalo", 2, 20,
+                padrao["intervalo_medio_entre_pedidos"]["min_reqs"],
+            ),
+        },
+        "itens_pequena_qtd_alta_freq": {
+            "min_pedidos": st.slider(
+                "Pingados: mín. de pedidos", 1, 50,
+                padrao["itens_pequena_qtd_alta_freq"]["min_pedidos"],
+            ),
+            "max_media_qtd": st.number_input(
+                "Pingados: máx. quantidade média por pedido", min_value=0.0,
+                value=float(padrao["itens_pequena_qtd_alta_freq"]["max_media_qtd"]), step=0.5,
+            ),
+        },
+    }
+
+# Instrumentação opcional: mede as etapas que rodam nesta execução do script
+medir_desempenho = st.sidebar.checkbox("Medir desempenho", value=False)
+medir_memoria = st.sidebar.checkbox("Incluir pico de memória (mais lento)", value=False) if medir_desempenho else False
+relatorio = RelatorioDesempenho(memoria=medir_memoria).ativar() if medir_desempenho else None
+
+try:
+    # Painel já calculado (mesmas planilhas, ano e limiares) volta do disco sem
+    # carregar a base. Senão, painel preguiçoso: cada tabela só é calculada
+    # quando uma aba a usa
+    impressao = impressao_digital_bases()
+    chave_disco = chave_resultado(impressao, ano, limiares=limiares_painel(limiares)) if impressao else None
+    painel_salvo = ler_painel_salvo(chave_disco) if chave_disco else None
+    if painel_salvo is not None:
+        painel = painel_salvo
+    else:
+        painel = PainelPreguicoso(lambda chave: tabela_do_ano(impressao, ano, chave, limiares), ano)
+
+    df_mes = painel["basicos_reqs_mes"]
+
+    # Lista de obras para filtro em algumas visões
+    obras_disp = sorted(df_mes["EMPRD"].unique()) if not df_mes.empty else []
+    obra_sel = st.sidebar.selectbox("Obra para detalhamento de recorrência mensal", options=obras_disp) if obras_disp else None
+
+    st.sidebar.markdown("---")
+    st.sidebar.write("**Indicadores brutos**")
+    sidebar_resumo = st.sidebar.empty()
+
+
+    # ---------------- Resumo no topo ----------------
+    # Os números só são preenchidos no fim do script, depois que as abas já
+    # renderizaram: a Visão Geral aparece sem esperar as outras tabelas
+    METRICAS_TOPO = [
+        (f"Itens com {limiares['basicos_reqs_mes']['min_reqs_mes']}+ REQs/mês", "qtd_itens_2plus_reqs_mes"),
+        ("Itens com REQs subsequentes", "qtd_itens_com_reqs_subsequentes"),
+        ("Itens com recorrência semanal", "qtd_itens_semanal_obra"),
+        ("Itens com intervalo médio calculado", "qtd_itens_com_intervalo_calculado"),
+        ("Itens pingados (alta freq / baixa qtd)", "qtd_itens_pequena_qtd_alta_freq"),
+    ]
+    metricas_topo = [col.empty() for col in st.columns(len(METRICAS_TOPO))]
+
+    st.markdown("---")
+
+    # ---------------- Abas principais ----------------
+    tab_resumo, tab_mensal, tab_subseq, tab_semanal, tab_intervalo, tab_pingados = st.tabs([
+        "Visão Geral",
+        "Recorrência Mensal",
+        "REQs Subsequentes",
+        "Recorrência Semanal",
+        "Intervalo Médio",
+        "Itens Pingados",
+    ])
+
+    # --- Aba: Visão Geral ---
+    with tab_resumo:
+        st.subheader("Top itens recorrentes (mensal)")
+        st.caption(
+            "Itens básicos que aparecem com maior frequência em requisições ao longo dos meses. "
+            "Esse gráfico mostra quantas vezes cada item foi solicitado ao longo do ano, "
+            "somando a recorrência mensal consolidada."
+        )
+        st.image(figura_bytes(plot_top_itens_recorrencia_mensal, df_mes))
 
-df_mes = painel["basicos_reqs_mes"]
-df_subseq = painel["basicos_reqs_subsequentes"]
-df_semana = painel["basicos_semanal_por_obra"]
-df_interval = painel["intervalo_medio_entre_pedidos"]
-df_pingados = painel["itens_pequena_qtd_alta_freq"]
-resumo = painel["resumo_indicadores"]
+        st.subheader("Itens em REQs subsequentes")
+        st.caption(
+            "Itens que foram pedidos novamente na requisição seguinte da mesma obra. "
+            "É útil para identificar padrões de reposição contínua ou falha no planejamento de compras."
+        )
+        st.image(figura_bytes(plot_itens_reqs_subsequentes, painel["basicos_reqs_subsequentes"]))
 
-# Lista de obras para filtro em algumas visões
-obras_disp = sorted(df_mes["EMPRD"].unique()) if not df_mes.empty else []
-obra_sel = st.sidebar.selectbox("Obra para detalhamento de recorrência mensal", options=obras_disp) if obras_disp else None
+        st.subheader("Itens pingados (alta frequência + baixa quantidade)")
+        st.caption(
+            "Itens que aparecem muitas vezes no ano, mas sempre em quantidades pequenas. "
+            "São potenciais candidatos para criação de kits, contratos de fornecimento ou compra recorrente."
+        )
+        st.image(figura_bytes(plot_itens_pingados, painel["itens_pequena_qtd_alta_freq"]))
 
-st.sidebar.markdown("---")
-st.sidebar.write("**Indicadores brutos**")
-st.sidebar.json(resumo)
 
+    # --- Aba: Recorrência Mensal ---
+    with tab_mensal:
+        st.subheader("Top itens básicos com recorrência mensal (geral)")
+        st.caption(
+            "Mostra quais itens básicos aparecem em mais requisições dentro dos meses analisados. "
+            "Ajuda a entender consumo recorrente por item, independentemente da obra."
+        )
+        st.image(figura_bytes(plot_top_itens_recorrencia_mensal, df_mes))
+
+        if obra_sel is not None:
+            st.subheader(f"Recorrência mensal - Obra {obra_sel}")
+            st.caption(
+                "Distribuição mensal de solicitações do item por obra. "
+                "Útil para entender sazonalidade ou padrões de reabastecimento específicos de cada projeto."
+            )
+            st.image(figura_bytes(plot_recorrencia_mensal_por_obra, df_mes, obra_sel))
+
+        if not df_mes.empty:
+            st.subheader("Tabela detalhada - Recorrência mensal")
+            st.caption(
+                "Tabela completa contendo todas as ocorrências mensais por item, obra e mês. "
+                "Representa a base utilizada na construção dos gráficos mensais."
+            )
+            st.dataframe(df_mes)
+
+
+    # --- Aba: REQs Subsequentes ---
+    with tab_subseq:
+        df_subseq = painel["basicos_reqs_subsequentes"]
+
+        st.subheader("Itens que aparecem em requisições subsequentes")
+        st.caption(
+            "Mostra os itens básicos que foram solicitados repetidamente de uma requisição para a próxima, "
+            "indicando uso contínuo ou potencial falta de estoque."
+        )
 
-# ---------------- Resumo no topo ----------------
-col1, col2, col3, col4, col5 = st.columns(5)
+        st.image(figura_bytes(plot_itens_reqs_subsequentes, df_subseq))
+
+        if not df_subseq.empty:
+            st.subheader("Tabela detalhada - REQs subsequentes")
+            st.caption("Lista completa dos itens em requisições sequenciais por obra.")
+            st.dataframe(df_subseq)
+
+
+    # --- Aba: Recorrência Semanal ---
+    with tab_semanal:
+        df_semana = painel["basicos_semanal_por_obra"]
+
+        st.subheader("Heatmap - Recorrência semanal por obra x item")
+        st.caption(
+            "Mapa de calor mostrando em quais semanas e obras cada item básico aparece. "
+            "Ajuda a identificar picos de demanda, frequência semanal e itens críticos."
+        )
+        st.image(figura_bytes(plot_recorrencia_semanal_heatmap, df_semana, top_itens=10, top_obras=10))
+
+        if not df_semana.empty:
+            st.subheader("Tabela detalhada - Recorrência semanal")
+            st.caption("Tabela base com a ocorrência semanal consolidada por obra e item.")
+            st.dataframe(df_semana)
+
+
+    # --- Aba: Intervalo Médio entre Pedidos ---
+    with tab_intervalo:
+        df_interval = painel["intervalo_medio_entre_pedidos"]
+
+        st.subheader("Intervalo médio entre pedidos x nº de REQs (itens básicos)")
+        st.caption(
+            "Mostra, para cada item, qual o intervalo médio em dias entre as solicitações. "
+            "Ótimo para prever periodicidade, necessidade futura e possíveis padrões de reposição."
+        )
+        st.image(figura_bytes(plot_intervalo_medio_scatter, df_interval))
+
+        if not df_interval.empty:
+            st.subheader("Tabela detalhada - Intervalos")
+            st.caption("Tabela contendo o intervalo médio por item e seu número total de requisições.")
+            st.dataframe(df_interval)
 
-col1.metric(
-    "Itens com 2+ REQs/mês",
-    resumo.get("qtd_itens_2plus_reqs_mes", 0),
-)
-col2.metric(
-    "Itens com REQs subsequentes",
-    resumo.get("qtd_itens_com_reqs_subsequentes", 0),
-)
-col3.metric(
-    "Itens com recorrência semanal",
-    resumo.get("qtd_itens_semanal_obra", 0),
-)
-col4.metric(
-    "Itens com intervalo médio calculado",
-    resumo.get("qtd_itens_com_intervalo_calculado", 0),
-)
-col5.metric(
-    "Itens pingados (alta freq / baixa qtd)",
-    resumo.get("qtd_itens_pequena_qtd_alta_freq", 0),
-)
 
-st.markdown("---")
-
-# ---------------- Abas principais ----------------
-tab_resumo, tab_mensal, tab_subseq, tab_semanal, tab_intervalo, tab_pingados = st.tabs([
-    "Visão Geral",
-    "Recorrência Mensal",
-    "REQs Subsequentes",
-    "Recorrência Semanal",
-    "Intervalo Médio",
-    "Itens Pingados",
-])
-
-# --- Aba: Visão Geral ---
-with tab_resumo:
-    st.subheader("Top itens recorrentes (mensal)")
-    st.caption(
-        "Itens básicos que aparecem com maior frequência em requisições ao longo dos meses. "
-        "Esse gráfico mostra quantas vezes cada item foi solicitado ao longo do ano, "
-        "somando a recorrência mensal consolidada."
-    )
-    fig1 = plot_top_itens_recorrencia_mensal(df_mes)
-    st.pyplot(fig1)
-
-    st.subheader("Itens em REQs subsequentes")
-    st.caption(
-        "Itens que foram pedidos novamente na requisição seguinte da mesma obra. "
-        "É útil para identificar padrões de reposição contínua ou falha no planejamento de compras."
-    )
-    fig2 = plot_itens_reqs_subsequentes(df_subseq)
-    st.pyplot(fig2)
-
-    st.subheader("Itens pingados (alta frequência + baixa quantidade)")
-    st.caption(
-        "Itens que aparecem muitas vezes no ano, mas sempre em quantidades pequenas. "
-        "São potenciais candidatos para criação de kits, contratos de fornecimento ou compra recorrente."
-    )
-    fig3 = plot_itens_pingados(df_pingados)
-    st.pyplot(fig3)
-
-
-# --- Aba: Recorrência Mensal ---
-with tab_mensal:
-    st.subheader("Top itens básicos com recorrência mensal (geral)")
-    st.caption(
-        "Mostra quais itens básicos aparecem em mais requisições dentro dos meses analisados. "
-        "Ajuda a entender consumo recorrente por item, independentemente da obra."
-    )
-    fig = plot_top_itens_recorrencia_mensal(df_mes)
-    st.pyplot(fig)
-
-    if obra_sel is not None:
-        st.subheader(f"Recorrência mensal - Obra {obra_sel}")
+    # --- Aba: Itens Pingados ---
+    with tab_pingados:
+        df_pingados = painel["itens_pequena_qtd_alta_freq"]
+
+        st.subheader("Itens pingados (alta frequência + baixa quantidade média)")
         st.caption(
-            "Distribuição mensal de solicitações do item por obra. "
-            "Útil para entender sazonalidade ou padrões de reabastecimento específicos de cada projeto."
+            "Itens que aparecem muitas vezes durante o ano, mas em pequenas quantidades por pedido. "
+            "Indicador importante para avaliar desperdícios logísticos, frete e possíveis compras recorrentes."
         )
-        fig_obra = plot_recorrencia_mensal_por_obra(df_mes, obra_sel)
-        st.pyplot(fig_obra)
+        st.image(figura_bytes(plot_itens_pingados, df_pingados))
+
+        if not df_pingados.empty:
+            st.subheader("Tabela detalhada - Itens pingados")
+            st.caption("Tabela com todos os itens pingados identificados no período.")
+            st.dataframe(df_pingados)
+
+
+    # ---------------- Preenche o resumo ----------------
+    resumo = painel["resumo_indicadores"]
+
+    for marcador, (rotulo, chave) in zip(metricas_topo, METRICAS_TOPO):
+        marcador.metric(rotulo, resumo.get(chave) or 0)
+
+    sidebar_resumo.json(resumo)
+
+    # Todas as abas já calcularam as suas tabelas: guarda o painel para os próximos
+    # reinícios (se o Excel mudou durante a execução, a chave já não vale)
+    if painel_salvo is None and chave_disco and impressao_digital_bases() == impressao:
+        cache_paineis().gravar(chave_disco, dict(painel))
+finally:
+    # Desliga sempre, mesmo com erro numa análise ou rerun interrompido pelo
+    # Streamlit: senão o tracemalloc segue ligado para o processo inteiro
+    if relatorio is not None:
+        relatorio.desativar()
+
+
+# ---------------- Desempenho ----------------
+if relatorio is not None:
+    relatorio.registrar_log()
 
-    if not df_mes.empty:
-        st.subheader("Tabela detalhada - Recorrência mensal")
+    with st.sidebar.expander("Desempenho", expanded=True):
         st.caption(
-            "Tabela completa contendo todas as ocorrências mensais por item, obra e mês. "
-            "Representa a base utilizada na construção dos gráficos mensais."
+            "Etapas executadas nesta atualização da página (tempo, linhas de entrada/saída "
+            "e pico de memória). O que veio do cache (base, tabelas, figuras) não aparece."
         )
-        st.dataframe(df_mes)
-
-
-# --- Aba: REQs Subsequentes ---
-with tab_subseq:
-    st.subheader("Itens que aparecem em requisições subsequentes")
-    st.caption(
-        "Mostra os itens básicos que foram solicitados repetidamente de uma requisição para a próxima, "
-        "indicando uso contínuo ou potencial falta de estoque."
-    )
-
-    fig = plot_itens_reqs_subsequentes(df_subseq)
-    st.pyplot(fig)
-
-    if not df_subseq.empty:
-        st.subheader("Tabela detalhada - REQs subsequentes")
-        st.caption("Lista completa dos itens em requisições sequenciais por obra.")
-        st.dataframe(df_subseq)
-
-
-# --- Aba: Recorrência Semanal ---
-with tab_semanal:
-    st.subheader("Heatmap - Recorrência semanal por obra x item")
-    st.caption(
-        "Mapa de calor mostrando em quais semanas e obras cada item básico aparece. "
-        "Ajuda a identificar picos de demanda, frequência semanal e itens críticos."
-    )
-    fig = plot_recorrencia_semanal_heatmap(df_semana, top_itens=10, top_obras=10)
-    st.pyplot(fig)
-
-    if not df_semana.empty:
-        st.subheader("Tabela detalhada - Recorrência semanal")
-        st.caption("Tabela base com a ocorrência semanal consolidada por obra e item.")
-        st.dataframe(df_semana)
-
-
-# --- Aba: Intervalo Médio entre Pedidos ---
-with tab_intervalo:
-    st.subheader("Intervalo médio entre pedidos x nº de REQs (itens básicos)")
-    st.caption(
-        "Mostra, para cada item, qual o intervalo médio em dias entre as solicitações. "
-        "Ótimo para prever periodicidade, necessidade futura e possíveis padrões de reposição."
-    )
-    fig = plot_intervalo_medio_scatter(df_interval)
-    st.pyplot(fig)
-
-    if not df_interval.empty:
-        st.subheader("Tabela detalhada - Intervalos")
-        st.caption("Tabela contendo o intervalo médio por item e seu número total de requisições.")
-        st.dataframe(df_interval)
-
-
-# --- Aba: Itens Pingados ---
-with tab_pingados:
-    st.subheader("Itens pingados (alta frequência + baixa quantidade média)")
-    st.caption(
-        "Itens que aparecem muitas vezes durante o ano, mas em pequenas quantidades por pedido. "
-        "Indicador importante para avaliar desperdícios logísticos, frete e possíveis compras recorrentes."
-    )
-    fig = plot_itens_pingados(df_pingados)
-    st.pyplot(fig)
-
-    if not df_pingados.empty:
-        st.subheader("Tabela detalhada - Itens pingados")
-        st.caption("Tabela com todos os itens pingados identificados no período.")
-        st.dataframe(df_pingados)
+        st.dataframe(relatorio.tabela(), hide_index=True)
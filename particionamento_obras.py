@@ -0,0 +1,248 @@
+# particionamento_obras.py
+
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from recorrencia_basicos import (
+    ANALISES_PAINEL,
+    CHAVES_SAIDA,
+    ContextoBasicos,
+    DataJanela,
+    _base_pingados,
+    _colunas_calendario,
+    _filtrar_basicos_ano,
+    _filtrar_pingados,
+    _limites_janela,
+    _nomes_insumos,
+    _nomes_obras,
+    _ordenar_saida,
+    _resumo_indicadores,
+    limiares_painel,
+)
+
+# Tabelas que agrupam primeiro por obra: cada partição já dá o resultado final
+TABELAS_POR_OBRA = [
+    "basicos_reqs_mes",
+    "basicos_reqs_subsequentes",
+    "basicos_semanal_por_obra",
+    "intervalo_medio_entre_pedidos",
+]
+TABELA_PINGADOS = "itens_pequena_qtd_alta_freq"
+
+
+# ============================================================
+# Partições por hash de EMPRD
+# ============================================================
+def _particao_por_obra(base: pd.DataFrame, n_particoes: int) -> np.ndarray:
+    # Hash do valor (não da posição): a mesma obra cai sempre na mesma partição
+    h = pd.util.hash_pandas_object(base["EMPRD"], index=False).to_numpy()
+    return (h % np.uint64(n_particoes)).astype(np.int64)
+
+
+def _gravar_particoes(base: pd.DataFrame, n_particoes: int, pasta: Path) -> list:
+    """
+    Grava cada partição em Feather sem compressão. Os workers leem o arquivo
+    por memory-map em vez de receber o DataFrame serializado pelo pool.
+    """
+    ids = _particao_por_obra(base, n_particoes)
+    caminhos = []
+    for i in range(n_particoes):
+        parte = base[ids == i]
+        if parte.empty:
+            continue
+        caminho = pasta / f"particao_{i:03d}.feather"
+        parte.reset_index(drop=True).to_feather(caminho, compression="uncompressed")
+        caminhos.append(caminho)
+    return caminhos
+
+
+# ============================================================
+# Trabalho de cada worker
+# ============================================================
+def _pingados_parcial(base: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Parciais do agregado de pingados que podem ser somados entre partições:
+    contagem, soma e nº de quantidades por insumo, mais os pares distintos
+    (insumo, OF) para o nunique.
+    """
+    base = _base_pingados(base)
+    chaves = CHAVES_SAIDA[TABELA_PINGADOS]
+
+    somas = (
+        base.groupby(chaves, observed=True)
+        .agg(
+            pedidos=("REQ_CDG", "count"),
+            qtd_total=("QTD_PED", "sum"),
+            n_qtd=("QTD_PED", "count"),
+        )
+        .reset_index()
+    )
+    ofs = base[chaves + ["OF_CDG"]].dropna(subset=["OF_CDG"]).drop_duplicates()
+    return {"somas": somas, "ofs": ofs}
+
+
+def _analisar_particao(
+    caminho: Path,
+    ano: Optional[int],
+    inicio: Optional[pd.Timestamp],
+    fim: Optional[pd.Timestamp],
+    limiares: Dict[str, Dict[str, Any]],
+    nomes_empr: pd.Series,
+    nomes_insumo: pd.Series,
+    categorias: Dict[str, pd.CategoricalDtype]
+) -> Dict[str, Any]:
+    from pyarrow import feather
+
+    base = feather.read_table(caminho, memory_map=True).to_pandas()
+    # Base compacta: devolve às colunas categóricas as categorias originais
+    # (o Arrow reconstrói as categorias com outro dtype de texto)
+    if categorias:
+        base = base.astype(categorias)
+
+    # Nomes vêm das dimensões da base inteira, como no painel sem partições
+    ctx = ContextoBasicos(
+        base=_colunas_calendario(base),
+        ano=ano,
+        nomes_empr=nomes_empr,
+        nomes_insumo=nomes_insumo,
+        inicio=inicio,
+        fim=fim,
+    )
+
+    tabelas = {
+        chave: func(ctx, **limiares[chave])
+        for chave, func, _ in ANALISES_PAINEL
+        if chave in TABELAS_POR_OBRA
+    }
+    tabelas[TABELA_PINGADOS] = _pingados_parcial(ctx.base)
+    return tabelas
+
+
+# ============================================================
+# Junção dos resultados
+# ============================================================
+def _juntar_por_obra(partes: list, tabela: str) -> Optional[pd.DataFrame]:
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return None
+
+    # Refaz a ordem das chaves (a do groupby sem partições) antes da
+    # ordenação final estável, para que os empates saiam na mesma ordem
+    out = pd.concat(partes, ignore_index=True)
+    out = out.sort_values(CHAVES_SAIDA[tabela], kind="stable")
+    return _ordenar_saida(out, tabela, [])
+
+
+def _juntar_pingados(parciais: list, min_pedidos: int, max_media_qtd: float) -> Optional[pd.DataFrame]:
+    chaves = CHAVES_SAIDA[TABELA_PINGADOS]
+    somas = [p["somas"] for p in parciais if not p["somas"].empty]
+    if not somas:
+        return None
+
+    # Soma exata (fsum) das parciais: a ordem das partições não muda o total
+    g = (
+        pd.concat(somas, ignore_index=True)
+        .groupby(chaves, observed=True)
+        .agg(pedidos=("pedidos", "sum"), qtd_total=("qtd_total", math.fsum), n_qtd=("n_qtd", "sum"))
+        .reset_index()
+    )
+    ofs = pd.concat([p["ofs"] for p in parciais], ignore_index=True).drop_duplicates()
+    distintas = ofs.groupby(chaves, observed=True)["OF_CDG"].nunique()
+
+    g = g.merge(distintas.rename("vezes_distintas").reset_index(), on=chaves, how="left")
+    g["vezes_distintas"] = g["vezes_distintas"].fillna(0).astype(np.int64)
+    g["media_qtd"] = g["qtd_total"] / g["n_qtd"]
+    g = g[chaves + ["pedidos", "media_qtd", "qtd_total", "vezes_distintas"]]
+
+    return _filtrar_pingados(g, min_pedidos, max_media_qtd, [])
+
+
+def painel_recorrencia_basicos_particionado(
+    df: pd.DataFrame,
+    ano: Optional[int] = 2025,
+    n_particoes: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    inicio: DataJanela = None,
+    fim: DataJanela = None,
+    limiares: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Mesmo resultado de `painel_recorrencia_basicos`, calculado em partições
+    da base por hash de EMPRD, cada uma num processo.
+
+    As quatro análises por obra rodam inteiras em cada partição (uma obra
+    nunca fica dividida) e os resultados são concatenados; os pingados são
+    somados a partir de parciais (contagens, somas e OFs distintas).
+    Voltada para extrações grandes (várias empresas), onde o custo de gravar
+    as partições é pequeno perto das análises.
+
+    `inicio` / `fim` e `limiares` funcionam como em `painel_recorrencia_basicos`.
+    """
+    n_particoes = int(n_particoes or os.cpu_count() or 1)
+    if n_particoes < 1:
+        raise ValueError("n_particoes deve ser >= 1")
+
+    inicio, fim = _limites_janela(inicio, fim)
+    limiares = limiares_painel(limiares)
+    base = _filtrar_basicos_ano(df, ano, inicio, fim)
+    nomes_empr = _nomes_obras(df)
+    nomes_insumo = _nomes_insumos(df)
+    ano = int(ano) if ano is not None else None
+    categorias = {
+        c: base[c].dtype for c in base.columns
+        if isinstance(base[c].dtype, pd.CategoricalDtype)
+    }
+
+    with tempfile.TemporaryDirectory(prefix="recorrencia_particoes_") as pasta:
+        caminhos = _gravar_particoes(base, n_particoes, Path(pasta))
+
+        with ProcessPoolExecutor(max_workers=max_workers or n_particoes) as pool:
+            resultados = list(pool.map(
+                _analisar_particao,
+                caminhos,
+                [ano] * len(caminhos),
+                [inicio] * len(caminhos),
+                [fim] * len(caminhos),
+                [limiares] * len(caminhos),
+                [nomes_empr] * len(caminhos),
+                [nomes_insumo] * len(caminhos),
+                [categorias] * len(caminhos),
+            ))
+
+    tabelas = {}
+    for chave, _, _ in ANALISES_PAINEL:
+        if chave == TABELA_PINGADOS:
+            out = _juntar_pingados([r[chave] for r in resultados], **limiares[chave])
+        else:
+            out = _juntar_por_obra([r[chave] for r in resultados], chave)
+        tabelas[chave] = out
+
+    # Tabela sem nenhuma linha: mesmo formato vazio das análises
+    vazio = _painel_vazio(ano, limiares)
+    tabelas = {
+        chave: (t if t is not None else vazio[chave])
+        for chave, t in tabelas.items()
+    }
+
+    return {
+        **tabelas,
+        "resumo_indicadores": _resumo_indicadores(ano, tabelas),
+    }
+
+
+def _painel_vazio(ano: Optional[int], limiares: Dict[str, Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
+    # As análises devolvem o formato vazio quando recebem uma base sem linhas
+    ctx = ContextoBasicos(
+        base=pd.DataFrame(),
+        ano=ano,
+        nomes_empr=pd.Series(dtype=object),
+        nomes_insumo=pd.Series(dtype=object),
+    )
+    return {chave: func(ctx, **limiares[chave]) for chave, func, _ in ANALISES_PAINEL}
@@ -1,9 +1,28 @@
+import contextvars
+import hashlib
 import pandas as pd
 import numpy as np
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union, Callable, Tuple
+from collections.abc import Mapping
 import os
+import threading
+import weakref
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
 
+from instrumentacao import etapa, instrumentar
+from leitor_excel import ler_excel_colunas
+from snapshot_bases import (
+    assinaturas_atuais,
+    assinaturas_fontes,
+    gravar_snapshot,
+    impressao_digital_fontes,
+    ler_snapshot,
+    ler_snapshot_anterior,
+)
+from cache_resultados import ORCAMENTO_PADRAO_MB, cache_do_diretorio, chave_resultado
+
 def get_base_dir():
     # LOCAL (VSCode) → usa __file__
     if "__file__" in globals():
@@ -13,39 +32,171 @@ def get_base_dir():
     return Path(os.getcwd()).resolve()
 
 
-def carregar_bases():
-    base_dir = get_base_dir()
-    df_erp = pd.read_excel(
-        base_dir / "total_indicadores.xlsx",
-        sheet_name="Planilha1",
+ARQUIVO_ERP = "total_indicadores.xlsx"
+ARQUIVO_BASICOS = "MateriaisBasicos.xlsx"
+
+# Colunas do export do ERP que são lidas (o resto da planilha é ignorado na
+# leitura). Ao mudar a lista, incrementar VERSAO_SNAPSHOT em snapshot_bases.
+COLUNAS_ERP = [
+    "REQ_CDG", "REQ_DATA", "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
+    "TIPO_MATERIAL", "QTD_PED", "OF_CDG", "OF_DATA", "FORNECEDOR_CDG",
+    "PRCTTL_INSUMO", "ITEM_PRCUNTPED", "TOTAL",
+]
+
+
+@instrumentar()
+def carregar_bases(
+    usar_snapshot: bool = True,
+    incremental: bool = False,
+    compacto: bool = False,
+    diretorio: Optional[Path] = None
+):
+    """
+    Carrega a base do ERP já tratada (datas, numéricos, FORNECEDOR_CDG com
+    zeros e TIPO_MATERIAL).
+
+    Com `usar_snapshot=True`, a base tratada fica gravada em Feather na pasta
+    `.cache_recorrencia` e é reaproveitada enquanto as duas planilhas de
+    origem não mudarem (tamanho/mtime/hash do conteúdo).
+
+    Com `incremental=True`, quando só o export do ERP mudou, apenas as linhas
+    posteriores à última marca d'água (maior REQ_CDG / REQ_DATA já ingeridos)
+    são tratadas e anexadas ao snapshot anterior. Se o export não for um
+    simples acréscimo de linhas (linhas já ingeridas editadas, removidas ou
+    reordenadas, ou MateriaisBasicos mudou), recai na carga completa,
+    reaproveitando o export já lido. A conferência das linhas ingeridas só é
+    gravada pelas cargas incrementais: depois de uma carga comum, a primeira
+    incremental é completa.
+
+    Com `compacto=True`, devolve a base dicionarizada (ver `compactar_base`).
+
+    A base sai ordenada por REQ_DATA (ver `ordenar_por_data`), o que deixa o
+    recorte por ano/período ser uma busca binária em vez de uma varredura,
+    e com as colunas de calendário em inteiros (ver `anexar_calendario`).
+
+    `diretorio` troca a pasta das planilhas (padrão: a do projeto).
+    """
+    base_dir = Path(diretorio) if diretorio is not None else get_base_dir()
+    fontes = _fontes(base_dir)
+
+    df_erp = ler_snapshot(base_dir, fontes) if usar_snapshot else None
+
+    if df_erp is None:
+        # Assinaturas tiradas antes de ler as planilhas: se o Excel for
+        # sobrescrito durante a carga, o snapshot não fica com a base antiga
+        # sob a assinatura do arquivo novo
+        assinaturas = _assinaturas_antes_da_leitura(base_dir, fontes) if usar_snapshot else None
+
+        bruto = hashes = None
+        if usar_snapshot and incremental:
+            df_erp, bruto, hashes = _carregar_incremental(base_dir)
+
+        if bruto is None:
+            bruto = _ler_erp_bruto(base_dir)
+
+        # Conferência do export inteiro para a próxima carga incremental (só
+        # nas cargas incrementais), antes do tratamento, que altera o bruto
+        if usar_snapshot and incremental and hashes is None:
+            hashes = _hash_linhas(bruto)
+        conferencia = _conferencia_linhas(hashes) if hashes is not None else None
+
+        if df_erp is None:
+            df_erp = _tratar_erp(bruto, _ler_codigos_basicos(base_dir))
+        del bruto
+
+        df_erp = ordenar_por_data(df_erp)
+
+        if usar_snapshot and assinaturas is not None:
+            gravar_snapshot(
+                df_erp, base_dir, fontes,
+                extras=_marcas_ingestao(df_erp, conferencia),
+                assinaturas=assinaturas,
+            )
+
+    # Ordinais de calendário: derivados, ficam fora do snapshot
+    df_erp = anexar_calendario(df_erp)
+
+    if compacto:
+        df_erp = compactar_base(df_erp)
+
+    _preparar_dimensoes(df_erp)
+    return df_erp
+
+
+def _fontes(base_dir: Path) -> list:
+    return [base_dir / ARQUIVO_ERP, base_dir / ARQUIVO_BASICOS]
+
+
+def _assinaturas_antes_da_leitura(base_dir: Path, fontes: list) -> Optional[Dict[str, Dict[str, Any]]]:
+    try:
+        return assinaturas_atuais(base_dir, fontes)
+    except OSError:
+        return None
+
+
+def impressao_digital_bases(diretorio: Optional[Path] = None) -> Optional[str]:
+    """Impressão digital das duas planilhas de origem, sem carregá-las (ver snapshot_bases)."""
+    base_dir = Path(diretorio) if diretorio is not None else get_base_dir()
+    return impressao_digital_fontes(base_dir, _fontes(base_dir))
+
+
+@instrumentar()
+def _ler_erp_bruto(base_dir: Path) -> pd.DataFrame:
+    """
+    Lê só as COLUNAS_ERP da Planilha1, em streaming (ver leitor_excel): a
+    planilha inteira nunca fica em memória, só o bloco de linhas em conversão.
+    """
+    return ler_excel_colunas(
+        base_dir / ARQUIVO_ERP,
+        "Planilha1",
+        colunas=COLUNAS_ERP,
         dtype={"INSUMO_CDG": "string", "FORNECEDOR_CDG": "string"},
     )
 
+
+@instrumentar()
+def _ler_codigos_basicos(base_dir: Path) -> set:
+    df_bas = pd.read_excel(
+        base_dir / ARQUIVO_BASICOS,
+        sheet_name="Final",
+        usecols=["Código"],
+        dtype={"Código": "string"},
+    ).drop_duplicates()
+
+    return set(df_bas["Código"].dropna())
+
+
+def _largura_codigo(serie: pd.Series) -> int:
+    tamanhos = serie.dropna().astype(str).str.len()
+    return int(tamanhos.max()) if not tamanhos.empty else 0
+
+
+@instrumentar()
+def _tratar_erp(df_erp: pd.DataFrame, cod_basicos: set, largura_fornecedor: int = 0) -> pd.DataFrame:
+    """
+    Tipagem e classificação das linhas brutas do ERP. `largura_fornecedor` é a
+    largura mínima do zfill em FORNECEDOR_CDG (para a carga incremental manter
+    a largura já usada na base).
+    """
     # Datas
-    df_erp["REQ_DATA"] = pd.to_datetime(df_erp["REQ_DATA"], errors="coerce")
-    df_erp["OF_DATA"] = pd.to_datetime(df_erp["OF_DATA"], errors="coerce")
+    with etapa("conversao_datas", len(df_erp)):
+        df_erp["REQ_DATA"] = pd.to_datetime(df_erp["REQ_DATA"], errors="coerce")
+        df_erp["OF_DATA"] = pd.to_datetime(df_erp["OF_DATA"], errors="coerce")
 
     # Numéricos
-    for col in ["PRCTTL_INSUMO", "ITEM_PRCUNTPED", "TOTAL"]:
-        if col in df_erp.columns:
-            df_erp[col] = pd.to_numeric(df_erp[col], errors="coerce")
+    with etapa("conversao_numericos", len(df_erp)):
+        for col in ["PRCTTL_INSUMO", "ITEM_PRCUNTPED", "TOTAL"]:
+            if col in df_erp.columns:
+                df_erp[col] = pd.to_numeric(df_erp[col], errors="coerce")
 
     # Preservar zeros no código do fornecedor
     if "FORNECEDOR_CDG" in df_erp.columns:
         df_erp["FORNECEDOR_CDG"] = df_erp["FORNECEDOR_CDG"].astype("string")
-        w = int(df_erp["FORNECEDOR_CDG"].dropna().astype(str).str.len().max())
+        w = max(_largura_codigo(df_erp["FORNECEDOR_CDG"]), int(largura_fornecedor))
         if w > 0:
             df_erp["FORNECEDOR_CDG"] = df_erp["FORNECEDOR_CDG"].str.zfill(w)
 
     # Classificação de básicos
-    df_bas = pd.read_excel(
-        base_dir / "MateriaisBasicos.xlsx",
-        sheet_name="Final",
-        usecols=["Código"],
-        dtype={"Código": "string"},
-    ).drop_duplicates()
-
-    cod_basicos = set(df_bas["Código"].dropna())
     if "TIPO_MATERIAL" not in df_erp.columns:
         pos = df_erp.columns.get_loc("INSUMO_CDG") + 1
         df_erp.insert(
@@ -56,129 +207,1011 @@ def carregar_bases():
 
     return df_erp
 
+
+# ============================================================
+# Representação compacta da base
+# ============================================================
+# Chaves e descrições repetidas milhares de vezes: viram categóricas
+# (códigos inteiros + tabela de valores), o que também acelera os groupby.
+COLUNAS_CATEGORICAS = [
+    "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
+    "TIPO_MATERIAL", "FORNECEDOR_CDG",
+]
+
+
+def compactar_base(df_erp: pd.DataFrame) -> pd.DataFrame:
+    """
+    Versão compacta da base do ERP:
+      - chaves e colunas de texto longas (*_DESC) como `category`;
+      - inteiros (REQ_CDG, OF_CDG, ...) no menor tipo inteiro que comporta os valores;
+      - reais (quantidades, preços) em float32 só quando a conversão é exata.
+
+    Os valores não mudam; só a representação em memória.
+    """
+    out = {}
+    for col in df_erp.columns:
+        s = df_erp[col]
+        if col in COLUNAS_CATEGORICAS or (col.endswith("_DESC") and not pd.api.types.is_numeric_dtype(s)):
+            out[col] = s.astype("category")
+        elif pd.api.types.is_integer_dtype(s):
+            out[col] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s):
+            s32 = s.astype(np.float32)
+            exato = (s32.astype(np.float64) == s) | s.isna()
+            out[col] = s32 if bool(exato.all()) else s
+        else:
+            out[col] = s
+
+    return pd.DataFrame(out, index=df_erp.index)
+
+
+# ============================================================
+# Carga incremental (delta do export do ERP)
+# ============================================================
+# Colunas do export conferidas na carga incremental: as linhas já ingeridas
+# precisam continuar iguais no export novo
+COLUNAS_CONFERENCIA = ["REQ_CDG", "REQ_DATA", "EMPRD", "INSUMO_CDG", "QTD_PED"]
+
+
+def _hash_linhas(bruto: pd.DataFrame) -> np.ndarray:
+    """
+    Hash de cada linha do export bruto nas COLUNAS_CONFERENCIA. Números viram
+    float e datas são convertidas antes, para que a mesma linha dê o mesmo
+    hash mesmo que o tipo inferido da coluna mude entre exports.
+    """
+    cols = {}
+    for c in COLUNAS_CONFERENCIA:
+        if c not in bruto.columns:
+            continue
+        s = bruto[c]
+        if c == "REQ_DATA":
+            cols[c] = pd.to_datetime(s, errors="coerce")
+        elif pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            cols[c] = s.astype(np.float64)
+        else:
+            cols[c] = s.astype("string")
+    return pd.util.hash_pandas_object(pd.DataFrame(cols), index=False).to_numpy()
+
+
+def _conferencia_linhas(hashes: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(hashes).tobytes()).hexdigest()
+
+
+def _marcas_ingestao(df_erp: pd.DataFrame, conferencia: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Marcas d'água gravadas na meta do snapshot para a próxima carga
+    incremental, com a conferência (ver `_hash_linhas`) das linhas ingeridas.
+    """
+    max_req = pd.to_numeric(df_erp["REQ_CDG"], errors="coerce").max() if "REQ_CDG" in df_erp.columns else np.nan
+    max_data = df_erp["REQ_DATA"].max() if "REQ_DATA" in df_erp.columns else pd.NaT
+
+    return {
+        "incremental": {
+            "linhas": int(len(df_erp)),
+            "max_req_cdg": None if pd.isna(max_req) else float(max_req),
+            "max_req_data": None if pd.isna(max_data) else pd.Timestamp(max_data).isoformat(),
+            "largura_fornecedor": (
+                _largura_codigo(df_erp["FORNECEDOR_CDG"]) if "FORNECEDOR_CDG" in df_erp.columns else 0
+            ),
+            "conferencia": conferencia,
+        }
+    }
+
+
+def _carregar_incremental(
+    base_dir: Path
+) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[np.ndarray]]:
+    """
+    Anexa ao snapshot anterior só as linhas novas do export do ERP.
+
+    Devolve (base, bruto, hashes): base None quando a carga incremental não
+    é segura; bruto é o export já lido (None se nem chegou a ser lido),
+    reaproveitado pela carga completa; hashes são os de `_hash_linhas(bruto)`
+    quando já calculados (None se não), para a conferência gravada no snapshot.
+    """
+    df_ant, meta = ler_snapshot_anterior(base_dir)
+    if df_ant is None or "incremental" not in meta:
+        return None, None, None
+
+    marcas = meta["incremental"]
+    if (
+        marcas.get("linhas") != len(df_ant)
+        or marcas.get("max_req_cdg") is None
+        or not marcas.get("conferencia")
+    ):
+        return None, None, None
+
+    # Mudou a lista de básicos → a classificação antiga não vale mais
+    try:
+        bas_atual = assinaturas_fontes([base_dir / ARQUIVO_BASICOS], meta)[ARQUIVO_BASICOS]
+    except OSError:
+        return None, None, None
+    if bas_atual["sha256"] != meta.get("arquivos", {}).get(ARQUIVO_BASICOS, {}).get("sha256"):
+        return None, None, None
+
+    bruto = _ler_erp_bruto(base_dir)
+
+    req = pd.to_numeric(bruto["REQ_CDG"], errors="coerce")
+    novas = req > marcas["max_req_cdg"]
+    if marcas.get("max_req_data") is not None:
+        datas = pd.to_datetime(bruto["REQ_DATA"], errors="coerce")
+        novas |= req.isna() & (datas > pd.Timestamp(marcas["max_req_data"]))
+
+    # Export precisa ser um acréscimo: as linhas antigas continuam todas lá,
+    # na mesma ordem e sem edições (mesma conferência da carga anterior)
+    antigas = ~novas.to_numpy()
+    if int(antigas.sum()) != len(df_ant):
+        return None, bruto, None
+    # Hash por linha uma vez só: as antigas são conferidas e o todo vai para a meta
+    hashes = _hash_linhas(bruto)
+    if _conferencia_linhas(hashes[antigas]) != marcas["conferencia"]:
+        return None, bruto, hashes
+
+    delta = bruto[novas.to_numpy()].reset_index(drop=True)
+    if delta.empty:
+        return df_ant, bruto, hashes
+
+    largura_ant = int(marcas.get("largura_fornecedor") or 0)
+    delta = _tratar_erp(delta, _ler_codigos_basicos(base_dir), largura_fornecedor=largura_ant)
+    if list(delta.columns) != list(df_ant.columns):
+        return None, bruto, hashes
+
+    # Fornecedor novo com código mais largo: realinha o zfill da base antiga
+    if "FORNECEDOR_CDG" in delta.columns:
+        largura_nova = _largura_codigo(delta["FORNECEDOR_CDG"])
+        if largura_nova > largura_ant and "FORNECEDOR_CDG" in df_ant.columns:
+            df_ant["FORNECEDOR_CDG"] = df_ant["FORNECEDOR_CDG"].astype("string").str.zfill(largura_nova)
+
+    return pd.concat([df_ant, delta], ignore_index=True), bruto, hashes
+
+
 # ============================================================
 # 1) Função base: filtrar só BÁSICOS em um ano
 # ============================================================
-def _filtrar_basicos_ano(df: pd.DataFrame, ano: Optional[int] = None) -> pd.DataFrame:
-    base = df.copy()
+# Colunas do ERP usadas pelas análises (o resto não é copiado para o contexto)
+COLUNAS_ANALISE = [
+    "REQ_CDG", "REQ_DATA", "EMPRD", "EMPRD_DESC", "INSUMO_CDG",
+    "INSUMO_DESC", "TIPO_MATERIAL", "QTD_PED", "OF_CDG",
+]
 
-    base["REQ_DATA"] = pd.to_datetime(base.get("REQ_DATA"), errors="coerce")
 
-    if "TIPO_MATERIAL" in base.columns:
-        base = base[base["TIPO_MATERIAL"].astype(str).str.upper() == "BÁSICO"]
+@instrumentar()
+def _filtrar_basicos_ano(
+    df: pd.DataFrame,
+    ano: Optional[int] = None,
+    inicio: "DataJanela" = None,
+    fim: "DataJanela" = None
+) -> pd.DataFrame:
+    """Básicos com REQ_DATA no `ano` e na janela [inicio, fim) (None = sem limite)."""
+    # Base ordenada por data: ano e janela são uma fatia contígua (sem cópia),
+    # o resto da base nem é olhado
+    indice = _indice_datas(df)
+    if indice is not None:
+        i, j = indice.ano(ano) if ano is not None else indice.com_data()
+        if inicio is not None or fim is not None:
+            k, l = indice.periodo(inicio, fim)
+            i, j = max(i, k), min(j, l)
+        df = df.iloc[i:max(i, j)]
+
+    datas = df["REQ_DATA"]
+    convertida = not pd.api.types.is_datetime64_any_dtype(datas)
+    if convertida:
+        datas = pd.to_datetime(datas, errors="coerce")
+
+    manter = datas.notna()
+
+    if "TIPO_MATERIAL" in df.columns:
+        # Compara só os valores distintos (poucos) em vez de upper() linha a linha
+        tipos = df["TIPO_MATERIAL"]
+        basicos = [t for t in pd.unique(tipos) if str(t).upper() == "BÁSICO"]
+        manter &= tipos.isin(basicos)
     # Se não tiver TIPO_MATERIAL (caso raro), deixa passar tudo
 
-    base = base.dropna(subset=["REQ_DATA"])
-
-    if ano is not None:
-        base = base[base["REQ_DATA"].dt.year == int(ano)]
+    if indice is None:
+        if ano is not None:
+            if "ANO" in df.columns and not convertida:
+                manter &= (df["ANO"] == int(ano)).fillna(False).astype(bool)
+            else:
+                manter &= datas.dt.year == int(ano)
+        if inicio is not None:
+            manter &= datas >= pd.Timestamp(inicio)
+        if fim is not None:
+            manter &= datas < pd.Timestamp(fim)
+
+    # Uma única cópia: só as linhas mantidas e as colunas usadas
+    cols = [c for c in df.columns if c in COLUNAS_ANALISE or (c in COLUNAS_CALENDARIO and not convertida)]
+    base = df.loc[manter.to_numpy(), cols]
+    if convertida:
+        base = base.assign(REQ_DATA=datas[manter.to_numpy()])
 
     return base
 
 
+def _mapa_descricao(base: pd.DataFrame, chave: str, desc: str) -> pd.DataFrame:
+    """
+    Primeira descrição não nula por chave (ou "" se não houver), sem lambda
+    por grupo: drop_duplicates mantém a primeira ocorrência de cada chave.
+    """
+    if chave not in base.columns:
+        return pd.DataFrame(columns=[chave, desc])
+
+    if desc not in base.columns:
+        nomes = base[[chave]].drop_duplicates()
+        nomes[desc] = nomes[chave].astype(str)
+        return nomes
+
+    chaves = base[chave].dropna().drop_duplicates().sort_values()
+    primeiros = base[[chave, desc]].dropna().drop_duplicates(subset=[chave])
+
+    nomes = pd.DataFrame({chave: chaves.to_numpy()})
+    nomes[desc] = (
+        nomes[chave]
+        .map(pd.Series(primeiros[desc].astype(str).to_numpy(), index=primeiros[chave].to_numpy()))
+        .fillna("")
+    )
+    return nomes
+
+
 def _mapa_empr_desc(base: pd.DataFrame) -> pd.DataFrame:
-    if "EMPRD" not in base.columns:
-        return pd.DataFrame(columns=["EMPRD", "EMPRD_DESC"])
-
-    if "EMPRD_DESC" in base.columns:
-        nomes = (
-            base.groupby("EMPRD")["EMPRD_DESC"]
-            .agg(lambda s: s.dropna().astype(str).iloc[0] if len(s.dropna()) > 0 else "")
-            .reset_index()
-        )
+    return _mapa_descricao(base, "EMPRD", "EMPRD_DESC")
+
+
+def _mapa_insumo_desc(base: pd.DataFrame) -> pd.DataFrame:
+    return _mapa_descricao(base, "INSUMO_CDG", "INSUMO_DESC")
+
+
+# ============================================================
+# Estruturas derivadas da base carregada (dimensões, ...)
+# ============================================================
+# Guardadas só para as bases registradas por `_preparar_dimensoes` (a de
+# carregar_bases, tratada como somente leitura), enquanto elas existirem.
+# Qualquer outro DataFrame tem as estruturas recalculadas a cada chamada.
+# Uma conferência barata (nº de linhas, colunas e o array de REQ_DATA)
+# descarta as estruturas se a base registrada ganhar/perder linhas ou tiver
+# colunas trocadas; edições de valores no lugar não são detectadas.
+_ESTRUTURAS_BASE: Dict[int, Dict[str, Any]] = {}
+
+
+def _conferencia_base(df: pd.DataFrame) -> tuple:
+    datas = df["REQ_DATA"].to_numpy() if "REQ_DATA" in df.columns else None
+    endereco = datas.__array_interface__["data"][0] if datas is not None and datas.dtype.kind == "M" else None
+    # Guarda o próprio array: enquanto ele existir, o endereço não é reaproveitado
+    return len(df), tuple(df.columns), endereco, datas
+
+
+def _mesma_conferencia(a: tuple, b: tuple) -> bool:
+    return a[:3] == b[:3] and a[2] is not None
+
+
+def _estrutura_base(df: pd.DataFrame, nome: str, construir) -> Any:
+    estruturas = _ESTRUTURAS_BASE.get(id(df))
+    if estruturas is None:
+        return construir(df)
+
+    conferencia = _conferencia_base(df)
+    if not _mesma_conferencia(estruturas["_conferencia"], conferencia):
+        estruturas.clear()
+        estruturas["_conferencia"] = conferencia
+
+    if nome not in estruturas:
+        estruturas[nome] = construir(df)
+    return estruturas[nome]
+
+
+def _registrar_base(df: pd.DataFrame) -> None:
+    chave = id(df)
+    if chave not in _ESTRUTURAS_BASE:
+        _ESTRUTURAS_BASE[chave] = {"_conferencia": _conferencia_base(df)}
+        weakref.finalize(df, _ESTRUTURAS_BASE.pop, chave, None)
+
+
+def _nomes_obras(df: pd.DataFrame) -> pd.Series:
+    """Dimensão de obras: EMPRD -> EMPRD_DESC (índice = EMPRD)."""
+    return _estrutura_base(
+        df, "nomes_obras",
+        lambda d: _mapa_empr_desc(d).set_index("EMPRD")["EMPRD_DESC"],
+    )
+
+
+def _nomes_insumos(df: pd.DataFrame) -> pd.Series:
+    """Dimensão de insumos: INSUMO_CDG -> INSUMO_DESC (índice = INSUMO_CDG)."""
+    return _estrutura_base(
+        df, "nomes_insumos",
+        lambda d: _mapa_insumo_desc(d).set_index("INSUMO_CDG")["INSUMO_DESC"],
+    )
+
+
+def _preparar_dimensoes(df: pd.DataFrame) -> None:
+    """Registra a base (somente leitura) e monta as estruturas derivadas dela."""
+    _registrar_base(df)
+    _nomes_obras(df)
+    _nomes_insumos(df)
+    _indice_datas(df)
+
+
+# ============================================================
+# Índice por data: recorte de ano/período por busca binária
+# ============================================================
+def ordenar_por_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Base ordenada por REQ_DATA (sem data no fim). Ordenação estável: linhas
+    da mesma data mantêm a ordem do export. Se já estiver ordenada, devolve
+    o próprio DataFrame.
+    """
+    if "REQ_DATA" not in df.columns or not pd.api.types.is_datetime64_any_dtype(df["REQ_DATA"]):
+        return df
+    if _datas_ordenadas(df["REQ_DATA"]):
+        return df
+    return df.sort_values("REQ_DATA", kind="stable", na_position="last").reset_index(drop=True)
+
+
+def _datas_ordenadas(datas: pd.Series) -> bool:
+    nulas = datas.isna().to_numpy()
+    n_validas = len(datas) - int(nulas.sum())
+    # Sem data só no fim, e o trecho com data em ordem crescente
+    return not nulas[:n_validas].any() and datas.iloc[:n_validas].is_monotonic_increasing
+
+
+# Limite de janela de datas: "2025-01-31", Timestamp, date... (None = sem limite)
+DataJanela = Optional[Union[str, pd.Timestamp]]
+
+
+@dataclass
+class IndiceDatas:
+    """
+    Posições da base ordenada por REQ_DATA: `datas` são as datas das linhas
+    com data (as primeiras `len(datas)` linhas) e `anos` dá o intervalo
+    [início, fim) de linhas de cada ano.
+    """
+    datas: np.ndarray
+    anos: Dict[int, Tuple[int, int]]
+
+    def com_data(self) -> Tuple[int, int]:
+        return 0, len(self.datas)
+
+    def ano(self, ano: int) -> Tuple[int, int]:
+        return self.anos.get(int(ano), (0, 0))
+
+    def periodo(self, inicio: DataJanela = None, fim: DataJanela = None) -> Tuple[int, int]:
+        """Linhas com REQ_DATA em [inicio, fim) (None = sem limite)."""
+        i = 0 if inicio is None else int(np.searchsorted(self.datas, np.datetime64(pd.Timestamp(inicio)), "left"))
+        j = len(self.datas) if fim is None else int(np.searchsorted(self.datas, np.datetime64(pd.Timestamp(fim)), "left"))
+        return i, max(i, j)
+
+
+def _construir_indice_datas(df: pd.DataFrame) -> Optional[IndiceDatas]:
+    if "REQ_DATA" not in df.columns or not pd.api.types.is_datetime64_any_dtype(df["REQ_DATA"]):
+        return None
+    if not _datas_ordenadas(df["REQ_DATA"]):
+        return None
+
+    datas = df["REQ_DATA"].dropna().to_numpy()
+    if datas.dtype.kind != "M":
+        # Datas com fuso: fica na varredura
+        return None
+    if len(datas) == 0:
+        return IndiceDatas(datas=datas, anos={})
+
+    primeiro = pd.Timestamp(datas[0]).year
+    ultimo = pd.Timestamp(datas[-1]).year
+    limites = np.searchsorted(
+        datas,
+        np.array([f"{a}-01-01" for a in range(primeiro, ultimo + 2)], dtype="datetime64[ns]").astype(datas.dtype),
+        "left",
+    )
+    anos = {
+        a: (int(limites[k]), int(limites[k + 1]))
+        for k, a in enumerate(range(primeiro, ultimo + 1))
+        if limites[k + 1] > limites[k]
+    }
+    return IndiceDatas(datas=datas, anos=anos)
+
+
+def _indice_datas(df: pd.DataFrame) -> Optional[IndiceDatas]:
+    """Índice da base (None se ela não estiver ordenada por REQ_DATA)."""
+    return _estrutura_base(df, "indice_datas", _construir_indice_datas)
+
+
+def fatia_periodo(df: pd.DataFrame, inicio: DataJanela = None, fim: DataJanela = None) -> pd.DataFrame:
+    """Linhas da base com REQ_DATA em [inicio, fim), por busca binária quando a base está ordenada."""
+    indice = _indice_datas(df)
+    if indice is not None:
+        return df.iloc[slice(*indice.periodo(inicio, fim))]
+
+    datas = pd.to_datetime(df["REQ_DATA"], errors="coerce")
+    manter = datas.notna()
+    if inicio is not None:
+        manter &= datas >= pd.Timestamp(inicio)
+    if fim is not None:
+        manter &= datas < pd.Timestamp(fim)
+    return df[manter.to_numpy()]
+
+
+def janela_movel(
+    df: pd.DataFrame,
+    dias: Optional[int] = None,
+    meses: Optional[int] = None,
+    referencia: DataJanela = None
+) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """
+    Janela [inicio, fim) dos últimos `dias` ou `meses` até o dia `referencia`
+    inclusive (padrão: a última REQ_DATA da base). Ex.: 12 meses móveis:
+        inicio, fim = janela_movel(df, meses=12)
+        painel_recorrencia_basicos(df, ano=None, inicio=inicio, fim=fim)
+    """
+    if (dias is None) == (meses is None):
+        raise ValueError("Informe `dias` ou `meses` (um dos dois).")
+
+    if referencia is None:
+        indice = _indice_datas(df)
+        if indice is not None:
+            referencia = indice.datas[-1] if len(indice.datas) else None
+        else:
+            referencia = pd.to_datetime(df["REQ_DATA"], errors="coerce").max()
+        if referencia is None or pd.isna(referencia):
+            raise ValueError("Base sem REQ_DATA: informe `referencia`.")
+
+    fim = pd.Timestamp(referencia).normalize() + pd.Timedelta(days=1)
+    if meses is not None:
+        inicio = fim - pd.DateOffset(months=int(meses))
     else:
-        nomes = base[["EMPRD"]].drop_duplicates()
-        nomes["EMPRD_DESC"] = nomes["EMPRD"].astype(str)
+        inicio = fim - pd.Timedelta(days=int(dias))
+    return inicio, fim
 
-    return nomes
 
+# ============================================================
+# Ordinais de calendário (inteiros) calculados na carga
+# ============================================================
+# DIA: dias desde 1970-01-01 | SEMANA_IDX: semanas de segunda a domingo
+# contadas sem interrupção | MES_IDX: meses desde 1970-01 | ANO | ANO_ISO.
+# As análises agrupam e comparam esses inteiros em vez de chamar os
+# accessors .dt (year, to_period, isocalendar) a cada contexto.
+COLUNAS_CALENDARIO = ["DIA", "SEMANA_IDX", "MES_IDX", "ANO", "ANO_ISO"]
+
+
+def _ordinais_calendario(dia: np.ndarray) -> Dict[str, np.ndarray]:
+    """Ordinais a partir de DIA (int64), só com aritmética inteira / datetime64 do numpy."""
+    mes = dia.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    # 1970-01-01 foi uma quinta: +3 alinha as semanas na segunda-feira (ISO)
+    semana = (dia + 3) // 7
+    # O ano ISO de um dia é o ano da quinta-feira da sua semana (dia semana * 7)
+    quinta = semana * 7
+    return {
+        "DIA": dia,
+        "SEMANA_IDX": semana,
+        "MES_IDX": mes,
+        "ANO": mes // 12 + 1970,
+        "ANO_ISO": quinta.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64) + 1970,
+    }
 
-def _mapa_insumo_desc(base: pd.DataFrame) -> pd.DataFrame:
-    if "INSUMO_CDG" not in base.columns:
-        return pd.DataFrame(columns=["INSUMO_CDG", "INSUMO_DESC"])
-
-    if "INSUMO_DESC" in base.columns:
-        nomes = (
-            base.groupby("INSUMO_CDG")["INSUMO_DESC"]
-            .agg(lambda s: s.dropna().astype(str).iloc[0] if len(s.dropna()) > 0 else "")
-            .reset_index()
+
+def _dias_desde_epoca(datas: pd.Series) -> Optional[np.ndarray]:
+    valores = datas.to_numpy()
+    if valores.dtype.kind != "M":
+        # Datas com fuso: não há ordinais prontos
+        return None
+    return valores.astype("datetime64[D]").astype(np.int64)
+
+
+@instrumentar()
+def anexar_calendario(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Base com as COLUNAS_CALENDARIO (Int32; nulas nas linhas sem REQ_DATA).
+    Feito uma vez em `carregar_bases`; as análises só recortam as colunas.
+    """
+    if "REQ_DATA" not in df.columns or not pd.api.types.is_datetime64_any_dtype(df["REQ_DATA"]):
+        return df
+    datas = df["REQ_DATA"]
+    validas = datas.notna().to_numpy()
+    dia = _dias_desde_epoca(datas[validas])
+    if dia is None:
+        return df
+
+    colunas = {}
+    for nome, valores in _ordinais_calendario(dia).items():
+        cheia = np.zeros(len(df), dtype=np.int32)
+        cheia[validas] = valores
+        colunas[nome] = pd.arrays.IntegerArray(cheia, ~validas)
+    return df.assign(**colunas)
+
+
+@instrumentar()
+def _anexar_nomes(out: pd.DataFrame, ctx: "ContextoBasicos") -> pd.DataFrame:
+    """Descrições de obra e insumo por lookup indexado nas dimensões."""
+    return out.assign(
+        EMPRD_DESC=out["EMPRD"].map(ctx.nomes_empr),
+        INSUMO_DESC=out["INSUMO_CDG"].map(ctx.nomes_insumo),
+    )
+
+
+# ============================================================
+# Contexto compartilhado: básicos do período já preparados
+# ============================================================
+@dataclass
+class ContextoBasicos:
+    """
+    Básicos de um período (ano e/ou janela [inicio, fim)) já filtrados, com
+    REQ_DATA convertida, colunas de calendário e mapas de nomes. Montado uma
+    vez e compartilhado (somente leitura) pelas análises do painel.
+
+    Colunas extras em `base`:
+      DIA (dias desde 1970-01-01) | ANO | MES_IDX (meses desde 1970-01) | ANO_ISO
+      | SEMANA_IDX (semanas de segunda a domingo contadas sem interrupção:
+        a semana 52/53 e a semana 1 do ano seguinte são vizinhas)
+    Todas em int64 (ver COLUNAS_CALENDARIO).
+
+    `nomes_empr` / `nomes_insumo` são as dimensões da base inteira
+    (EMPRD -> EMPRD_DESC, INSUMO_CDG -> INSUMO_DESC), montadas no carregamento.
+
+    O cubo de incidência do período (ver `cubo_incidencia`) e as estatísticas
+    de cada análise (ver `estatisticas_analise`) são montados no primeiro uso
+    e guardados no próprio contexto.
+    """
+    base: pd.DataFrame
+    ano: Optional[int]
+    nomes_empr: pd.Series
+    nomes_insumo: pd.Series
+    inicio: Optional[pd.Timestamp] = None
+    fim: Optional[pd.Timestamp] = None
+    _cubos: Dict[bool, pd.DataFrame] = field(default_factory=dict, repr=False, compare=False)
+    _estatisticas: Dict[Tuple[str, bool], pd.DataFrame] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def tem_janela(self) -> bool:
+        return self.inicio is not None or self.fim is not None
+
+
+@instrumentar()
+def preparar_contexto_basicos(
+    df: pd.DataFrame,
+    ano: Optional[int] = None,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> ContextoBasicos:
+    """Filtra os básicos do período e deriva datas/nomes uma única vez."""
+    inicio, fim = _limites_janela(inicio, fim)
+    return ContextoBasicos(
+        base=_colunas_calendario(_filtrar_basicos_ano(df, ano, inicio, fim)),
+        ano=int(ano) if ano is not None else None,
+        nomes_empr=_nomes_obras(df),
+        nomes_insumo=_nomes_insumos(df),
+        inicio=inicio,
+        fim=fim,
+    )
+
+
+def _limites_janela(inicio: DataJanela, fim: DataJanela) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    inicio = pd.Timestamp(inicio) if inicio is not None else None
+    fim = pd.Timestamp(fim) if fim is not None else None
+    if inicio is not None and fim is not None and fim < inicio:
+        raise ValueError(f"Janela inválida: fim ({fim.date()}) antes do início ({inicio.date()}).")
+    return inicio, fim
+
+
+def _colunas_calendario(base: pd.DataFrame) -> pd.DataFrame:
+    # Base vinda de carregar_bases: os ordinais já estão prontos (sem nulos
+    # depois do filtro); senão, calcula só para as linhas do período
+    if all(c in base.columns for c in COLUNAS_CALENDARIO):
+        ordinais = {c: base[c].to_numpy(dtype=np.int64) for c in COLUNAS_CALENDARIO}
+    else:
+        dia = _dias_desde_epoca(base["REQ_DATA"])
+        if dia is None:
+            dia = base["REQ_DATA"].dt.tz_localize(None).to_numpy().astype("datetime64[D]").astype(np.int64)
+        ordinais = _ordinais_calendario(dia)
+    return base.assign(**ordinais)
+
+
+def _obter_contexto(
+    df: Union[pd.DataFrame, ContextoBasicos],
+    ano: Optional[int],
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> ContextoBasicos:
+    if isinstance(df, ContextoBasicos):
+        if ano is not None and df.ano != int(ano):
+            raise ValueError(f"Contexto preparado para o ano {df.ano}, não para {ano}.")
+        if (inicio is not None or fim is not None) and _limites_janela(inicio, fim) != (df.inicio, df.fim):
+            raise ValueError(f"Contexto preparado para a janela [{df.inicio}, {df.fim}), não [{inicio}, {fim}).")
+        return df
+    return preparar_contexto_basicos(df, ano, inicio, fim)
+
+
+# ============================================================
+# Cubo de incidência obra × insumo × dia
+# ============================================================
+# Uma linha por (obra, insumo, dia) em que o par aparece no período, com:
+#   N_REQS: REQs do par contadas naquele dia (cada REQ conta uma vez por
+#           obra + insumo, no dia da sua primeira linha na base)
+#   MES_IDX / ANO_ISO / SEMANA_IDX do dia, para as agregações por mês e semana
+# As tabelas mensal, semanal e de intervalos saem do cubo (muito menor que
+# a base) em vez de cada uma varrer as linhas do ERP.
+COLS_CUBO = ["EMPRD", "INSUMO_CDG", "DIA", "MES_IDX", "ANO_ISO", "SEMANA_IDX", "N_REQS"]
+
+_TRAVA_CUBO = threading.Lock()
+
+
+def cubo_incidencia(ctx: ContextoBasicos, por_ano: bool = False) -> pd.DataFrame:
+    """
+    Cubo de incidência do contexto (montado uma vez e reaproveitado). Com
+    `por_ano=True`, ANO entra na chave e a contagem de REQs é feita por ano.
+    """
+    # Análises rodando em threads pedem o mesmo cubo ao mesmo tempo
+    with _TRAVA_CUBO:
+        if por_ano not in ctx._cubos:
+            ctx._cubos[por_ano] = _montar_cubo(ctx.base, _prefixo_ano(por_ano))
+        return ctx._cubos[por_ano]
+
+
+@instrumentar()
+def _montar_cubo(base: pd.DataFrame, pre: list) -> pd.DataFrame:
+    chaves = pre + ["EMPRD", "INSUMO_CDG", "DIA"]
+    if base.empty:
+        return pd.DataFrame(columns=pre + COLS_CUBO)
+
+    base = base.dropna(subset=["EMPRD", "INSUMO_CDG"])
+
+    # Primeira linha de cada obra + REQ + insumo (a mesma que o drop_duplicates manteria)
+    if "REQ_CDG" in base.columns:
+        com_req = base["REQ_CDG"].notna()
+        primeira = com_req & ~base.duplicated(subset=pre + ["EMPRD", "REQ_CDG", "INSUMO_CDG"])
+    else:
+        primeira = pd.Series(False, index=base.index)
+
+    return (
+        base[chaves + ["MES_IDX", "ANO_ISO", "SEMANA_IDX"]]
+        .assign(N_REQS=primeira.to_numpy().astype(np.int64))
+        .groupby(chaves, observed=True, sort=True)
+        .agg(
+            MES_IDX=("MES_IDX", "first"),
+            ANO_ISO=("ANO_ISO", "first"),
+            SEMANA_IDX=("SEMANA_IDX", "first"),
+            N_REQS=("N_REQS", "sum"),
         )
+        .reset_index()
+    )
+
+
+# ============================================================
+# Motor vetorizado de sequências por obra + insumo
+# ============================================================
+def _inicio_de_grupo(p: pd.DataFrame, chaves: list) -> np.ndarray:
+    """Em `p` ordenado por `chaves`: True na primeira linha de cada combinação."""
+    inicio = np.zeros(len(p), dtype=bool)
+    if len(p):
+        inicio[0] = True
+    for c in chaves:
+        k = p[c].cat.codes.to_numpy() if isinstance(p[c].dtype, pd.CategoricalDtype) else p[c].to_numpy()
+        inicio[1:] |= k[1:] != k[:-1]
+    return inicio
+
+
+def _sequencias_por_par(valores: pd.DataFrame, chaves: list, col: str) -> pd.DataFrame:
+    """
+    Para cada combinação de `chaves`, considera os valores inteiros distintos
+    de `col` em ordem crescente e calcula, de uma vez para todas as
+    combinações (ordenação + diff + ids de sequência, sem loop em Python):
+      - N_VALORES : quantos valores distintos
+      - N_LIGACOES: quantos vizinhos com diferença == 1
+      - MAX_SEQ   : maior sequência de valores consecutivos (mínimo 1)
+      - DIFF_MEDIA / DIFF_MIN / DIFF_MAX: estatísticas das diferenças entre
+        vizinhos (NaN quando a combinação tem um único valor)
+
+    Saída: uma linha por combinação, ordenada pelas chaves (mesma ordem do groupby).
+    """
+    p = valores[chaves + [col]].drop_duplicates().sort_values(chaves + [col])
+    n = len(p)
+    if n == 0:
+        return pd.DataFrame(columns=chaves + [
+            "N_VALORES", "N_LIGACOES", "MAX_SEQ", "DIFF_MEDIA", "DIFF_MIN", "DIFF_MAX"
+        ])
+
+    v = p[col].to_numpy(dtype=np.int64)
+
+    inicio = _inicio_de_grupo(p, chaves)
+    inicios = np.flatnonzero(inicio)
+
+    diffs = np.zeros(n, dtype=np.int64)
+    diffs[1:] = v[1:] - v[:-1]
+
+    # Ligação = mesmo par e valor imediatamente seguinte
+    liga = (diffs == 1) & ~inicio
+
+    # Cada não-ligação abre uma sequência nova; posição dentro da sequência
+    abre = np.flatnonzero(~liga)
+    id_seq = np.cumsum(~liga) - 1
+    pos_seq = np.arange(n) - abre[id_seq] + 1
+
+    n_valores = np.diff(np.append(inicios, n))
+    fins = inicios + n_valores - 1
+    tem_diff = n_valores > 1
+
+    # Diferenças só dentro do par; a 1ª linha de cada par não entra no min/max
+    maior = np.iinfo(np.int64).max
+    menor = np.iinfo(np.int64).min
+    diff_min = np.minimum.reduceat(np.where(inicio, maior, diffs), inicios)
+    diff_max = np.maximum.reduceat(np.where(inicio, menor, diffs), inicios)
+
+    out = p.iloc[inicios][chaves].reset_index(drop=True)
+    out["N_VALORES"] = n_valores
+    out["N_LIGACOES"] = np.add.reduceat(liga.astype(np.int64), inicios)
+    out["MAX_SEQ"] = np.maximum.reduceat(pos_seq, inicios)
+    # Valores ordenados: soma das diferenças = último - primeiro
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["DIFF_MEDIA"] = np.where(tem_diff, (v[fins] - v[inicios]) / (n_valores - 1), np.nan)
+    out["DIFF_MIN"] = np.where(tem_diff, diff_min, np.nan)
+    out["DIFF_MAX"] = np.where(tem_diff, diff_max, np.nan)
+    return out
+
+
+# ============================================================
+# Semanas por obra + insumo em bitset
+# ============================================================
+BITS_PALAVRA = 64
+
+
+@dataclass
+class SemanasPorPar:
+    """
+    Semanas com REQ de cada par, em bitset: linha i de `bits` (uint64, largura
+    fixa) é o par `chaves.iloc[i]`; o bit j marca a semana `semana_inicial + j`
+    (por ano, no modo multi-ano). Um ano cabe numa palavra: 8 bytes por par.
+
+    Semanas distintas = popcount; maior sequência = poucos shift + AND;
+    juntar pares com a mesma `semana_inicial` = OR das linhas.
+    """
+    chaves: pd.DataFrame
+    bits: np.ndarray
+    semana_inicial: np.ndarray
+
+    def semanas_distintas(self) -> np.ndarray:
+        return _popcount(self.bits).sum(axis=1).astype(np.int64)
+
+    def maior_sequencia(self) -> np.ndarray:
+        return _maior_sequencia_bits(self.bits)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    # numpy < 2.0
+    return np.unpackbits(bits.view(np.uint8), axis=-1).reshape(*bits.shape, BITS_PALAVRA).sum(axis=-1)
+
+
+def _deslocar(bits: np.ndarray, n: int) -> np.ndarray:
+    """Bitset deslocado `n` semanas para frente (bit j -> j + n), palavras com vai-um."""
+    palavras, r = divmod(int(n), BITS_PALAVRA)
+    out = np.zeros_like(bits)
+    largura = bits.shape[1]
+    if palavras >= largura:
+        return out
+    origem = bits[:, :largura - palavras]
+    out[:, palavras:] = origem << np.uint64(r)
+    if r:
+        out[:, palavras + 1:] |= origem[:, :-1] >> np.uint64(BITS_PALAVRA - r)
+    return out
+
+
+def _maior_sequencia_bits(bits: np.ndarray) -> np.ndarray:
+    """
+    Maior sequência de bits 1 seguidos em cada linha, com O(log semanas)
+    operações vetorizadas: P[k] marca o fim de sequências >= 2**k
+    (P[k] = P[k-1] & (P[k-1] << 2**(k-1))); depois, de k alto para baixo,
+    cada linha soma 2**k ao comprimento enquanto ainda houver sequência.
+    """
+    n_linhas, largura = bits.shape
+    potencias = [bits]
+    while (1 << len(potencias)) <= largura * BITS_PALAVRA:
+        anterior = potencias[-1]
+        proxima = anterior & _deslocar(anterior, 1 << (len(potencias) - 1))
+        if not proxima.any():
+            break
+        potencias.append(proxima)
+
+    comprimento = np.zeros(n_linhas, dtype=np.int64)
+    atual = np.zeros_like(bits)    # fins das sequências >= comprimento (linhas com comprimento > 0)
+    for k in range(len(potencias) - 1, -1, -1):
+        passo = 1 << k
+        candidato = np.where(
+            (comprimento == 0)[:, None],
+            potencias[k],
+            potencias[k] & _deslocar(atual, passo),
+        )
+        avanca = candidato.any(axis=1)
+        atual[avanca] = candidato[avanca]
+        comprimento[avanca] += passo
+    return comprimento
+
+
+def semanas_por_par(cubo: pd.DataFrame, chaves: list, pre: list) -> SemanasPorPar:
+    """
+    Bitset de semanas por combinação de `chaves` a partir do cubo de
+    incidência (ordenado pelas chaves). Com `pre` (modo multi-ano), cada ano
+    conta as semanas a partir da sua primeira semana.
+    """
+    semana = cubo["SEMANA_IDX"].to_numpy(dtype=np.int64)
+    if pre:
+        inicial = cubo.groupby(pre, observed=True)["SEMANA_IDX"].transform("min").to_numpy(dtype=np.int64)
     else:
-        nomes = base[["INSUMO_CDG"]].drop_duplicates()
-        nomes["INSUMO_DESC"] = nomes["INSUMO_CDG"].astype(str)
+        inicial = np.full(len(cubo), semana.min() if len(cubo) else 0, dtype=np.int64)
+    rel = semana - inicial
+
+    inicio = _inicio_de_grupo(cubo, chaves)
+    inicios = np.flatnonzero(inicio)
+    par = np.cumsum(inicio) - 1
+
+    largura = max(1, int(rel.max()) // BITS_PALAVRA + 1) if len(rel) else 1
+    bits = np.zeros(len(inicios) * largura, dtype=np.uint64)
+    if len(rel):
+        # Um OR por palavra: posições (par, palavra) ordenadas, reduceat por posição
+        posicao = par * largura + rel // BITS_PALAVRA
+        ordem = np.argsort(posicao, kind="stable")
+        posicao = posicao[ordem]
+        valores = np.left_shift(np.uint64(1), (rel[ordem] % BITS_PALAVRA).astype(np.uint64))
+        cortes = np.flatnonzero(np.r_[True, posicao[1:] != posicao[:-1]])
+        bits[posicao[cortes]] = np.bitwise_or.reduceat(valores, cortes)
+
+    return SemanasPorPar(
+        chaves=cubo.iloc[inicios][chaves].reset_index(drop=True),
+        bits=bits.reshape(len(inicios), largura),
+        semana_inicial=inicial[inicios],
+    )
 
-    return nomes
+
+# ============================================================
+# Colunas de saída das análises
+# ============================================================
+COLS_REQS_MES = [
+    "EMPRD", "EMPRD_DESC", "ANO_MES",
+    "INSUMO_CDG", "INSUMO_DESC", "QTD_REQS_MES"
+]
+COLS_REQS_SUBSEQ = [
+    "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
+    "TOTAL_REQS_ITEM", "N_LIGACOES_SUBSEQ", "MAX_SEQ_SUBSEQ"
+]
+COLS_SEMANAL = [
+    "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
+    "SEMANAS_DISTINTAS", "MAX_SEQ_SEMANAS"
+]
+COLS_INTERVALO = [
+    "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
+    "TOTAL_REQS_ITEM", "INTERVALO_MEDIO_DIAS",
+    "INTERVALO_MIN_DIAS", "INTERVALO_MAX_DIAS"
+]
+COLS_PINGADOS = [
+    "INSUMO_CDG", "INSUMO_DESC",
+    "pedidos", "media_qtd", "qtd_total", "vezes_distintas"
+]
+
+
+# Chaves de agrupamento de cada tabela (ordem das linhas antes da ordenação final)
+CHAVES_SAIDA = {
+    "basicos_reqs_mes": ["EMPRD", "ANO_MES", "INSUMO_CDG"],
+    "basicos_reqs_subsequentes": ["EMPRD", "INSUMO_CDG"],
+    "basicos_semanal_por_obra": ["EMPRD", "INSUMO_CDG"],
+    "intervalo_medio_entre_pedidos": ["EMPRD", "INSUMO_CDG"],
+    "itens_pequena_qtd_alta_freq": ["INSUMO_CDG", "INSUMO_DESC"],
+}
+
+# Ordenação final de cada tabela: (colunas, ascendente)
+ORDEM_SAIDA = {
+    "basicos_reqs_mes": (["EMPRD", "ANO_MES", "QTD_REQS_MES"], [True, True, False]),
+    "basicos_reqs_subsequentes": (
+        ["N_LIGACOES_SUBSEQ", "MAX_SEQ_SUBSEQ", "TOTAL_REQS_ITEM"], [False, False, False]
+    ),
+    "basicos_semanal_por_obra": (["MAX_SEQ_SEMANAS", "SEMANAS_DISTINTAS"], [False, False]),
+    "intervalo_medio_entre_pedidos": (["INTERVALO_MEDIO_DIAS", "TOTAL_REQS_ITEM"], [True, False]),
+    "itens_pequena_qtd_alta_freq": (["pedidos", "media_qtd"], [False, True]),
+}
+
+
+def _prefixo_ano(por_ano: bool) -> list:
+    # No modo multi-ano, o ano da REQ entra como primeira chave de agrupamento
+    return ["ANO"] if por_ano else []
+
+
+def _ordenar_saida(out: pd.DataFrame, tabela: str, pre: list) -> pd.DataFrame:
+    # Ordenação estável: empates ficam na ordem das chaves de agrupamento
+    cols, asc = ORDEM_SAIDA[tabela]
+    return out.sort_values(
+        pre + cols,
+        ascending=[True] * len(pre) + asc,
+        kind="stable"
+    ).reset_index(drop=True)
+
+
+# ============================================================
+# Estatísticas e limiares
+# ============================================================
+# Cada análise tem duas etapas:
+#   - estatísticas: métricas de todos os pares/itens do período, sem limiar
+#     (a parte cara: agrupamentos e sequências). Guardadas no contexto;
+#   - filtro: aplica os limiares e ordena a saída (barato).
+# Mudar um limiar só refaz o filtro sobre as estatísticas já calculadas.
+def _tem_ano(estatisticas: pd.DataFrame) -> list:
+    return _prefixo_ano("ANO" in estatisticas.columns)
+
+
+def _saida_filtrada(estatisticas: pd.DataFrame, manter: pd.Series, tabela: str, colunas: list) -> pd.DataFrame:
+    pre = _tem_ano(estatisticas)
+    out = estatisticas.loc[manter.to_numpy(), pre + colunas]
+    if out.empty:
+        return pd.DataFrame(columns=pre + colunas)
+    return _ordenar_saida(out, tabela, pre)
 
 
 # ============================================================
 # 2) Básicos com 2+ requisições no mesmo mês
 # ============================================================
+@instrumentar()
 def basicos_reqs_mes(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, ContextoBasicos],
     ano: Optional[int] = None,
-    min_reqs_mes: int = 1
+    min_reqs_mes: int = 1,
+    por_ano: bool = False,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
 ) -> pd.DataFrame:
     """
     Itens básicos que aparecem em pelo menos `min_reqs_mes` requisições distintas
     no mesmo mês (por obra).
 
+    Com `por_ano=True`, calcula todos os anos de uma vez e acrescenta a
+    coluna ANO (primeira chave).
+
+    `inicio` / `fim` restringem as REQs à janela [inicio, fim), junto com
+    `ano` (use ano=None para uma janela que cruza anos). Vale para todas as
+    análises deste módulo.
+
     Saída:
       EMPRD | EMPRD_DESC | ANO_MES | INSUMO_CDG | INSUMO_DESC | QTD_REQS_MES
     """
-    base = _filtrar_basicos_ano(df, ano)
+    ctx = _obter_contexto(df, ano, inicio, fim)
+    return _filtro_reqs_mes(estatisticas_analise(ctx, "basicos_reqs_mes", por_ano), min_reqs_mes)
 
-    if base.empty or "REQ_CDG" not in base.columns:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "ANO_MES",
-            "INSUMO_CDG", "INSUMO_DESC", "QTD_REQS_MES"
-        ])
-
-    base["REQ_DATA_DT"] = pd.to_datetime(base["REQ_DATA"], errors="coerce")
-    base = base.dropna(subset=["REQ_DATA_DT", "EMPRD", "REQ_CDG", "INSUMO_CDG"])
 
-    base["ANO_MES"] = base["REQ_DATA_DT"].dt.to_period("M")
+def _estatisticas_reqs_mes(ctx: ContextoBasicos, pre: list) -> pd.DataFrame:
+    if ctx.base.empty or "REQ_CDG" not in ctx.base.columns:
+        return pd.DataFrame(columns=pre + COLS_REQS_MES)
 
-    # Não contar duplicado mesmo insumo-requisição
-    dedup = base.drop_duplicates(subset=["EMPRD", "REQ_CDG", "INSUMO_CDG"])
+    # REQs distintas por mês: soma das REQs por dia do cubo (cada insumo-requisição conta uma vez)
+    cubo = cubo_incidencia(ctx, bool(pre))
+    cubo = cubo[cubo["N_REQS"] > 0]
 
     g = (
-        dedup.groupby(["EMPRD", "ANO_MES", "INSUMO_CDG"])["REQ_CDG"]
-        .nunique()
+        cubo.groupby(pre + ["EMPRD", "MES_IDX", "INSUMO_CDG"], observed=True)["N_REQS"]
+        .sum()
         .reset_index(name="QTD_REQS_MES")
     )
 
-    g = g[g["QTD_REQS_MES"] >= int(min_reqs_mes)]
-    if g.empty:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "ANO_MES",
-            "INSUMO_CDG", "INSUMO_DESC", "QTD_REQS_MES"
-        ])
-
     # Junta nomes
-    nomes_empr = _mapa_empr_desc(base)
-    nomes_insumo = _mapa_insumo_desc(base)
+    out = _anexar_nomes(g, ctx)
 
-    out = (
-        g.merge(nomes_empr, on="EMPRD", how="left")
-         .merge(nomes_insumo, on="INSUMO_CDG", how="left")
-    )
+    out["ANO_MES"] = _rotulo_mes(out["MES_IDX"])
+    return out[pre + COLS_REQS_MES]
+
+
+def _rotulo_mes(mes_idx: pd.Series) -> pd.Series:
+    """MES_IDX -> "AAAA-MM", formatando só os meses distintos."""
+    rotulos = {m: f"{m // 12 + 1970:04d}-{m % 12 + 1:02d}" for m in pd.unique(mes_idx)}
+    return mes_idx.map(rotulos).astype(str)
 
-    out["ANO_MES"] = out["ANO_MES"].astype(str)
-    out = out[[
-        "EMPRD", "EMPRD_DESC", "ANO_MES",
-        "INSUMO_CDG", "INSUMO_DESC", "QTD_REQS_MES"
-    ]]
 
-    return out.sort_values(["EMPRD", "ANO_MES", "QTD_REQS_MES"], ascending=[True, True, False]).reset_index(drop=True)
+def _filtro_reqs_mes(estatisticas: pd.DataFrame, min_reqs_mes: int = 1) -> pd.DataFrame:
+    manter = estatisticas["QTD_REQS_MES"] >= int(min_reqs_mes)
+    return _saida_filtrada(estatisticas, manter, "basicos_reqs_mes", COLS_REQS_MES)
 
 
 # ============================================================
 # 3) Básicos em requisições subsequentes (REQs consecutivas)
 # ============================================================
+@instrumentar()
 def basicos_reqs_subsequentes(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, ContextoBasicos],
     ano: Optional[int] = None,
-    min_ligacoes: int = 1
+    min_ligacoes: int = 1,
+    por_ano: bool = False,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
 ) -> pd.DataFrame:
     """
     Identifica itens básicos que aparecem em REQs consecutivas de uma mesma obra.
@@ -188,113 +1221,76 @@ def basicos_reqs_subsequentes(
       - N_LIGACOES_SUBSEQ: quantas ligações REQ(n) -> REQ(n+1)
       - MAX_SEQ_SUBSEQ: maior sequência contínua de REQs consecutivas contendo o item
 
+    Com `por_ano=True`, a ordem das REQs é numerada por ano + obra e a saída
+    ganha a coluna ANO.
+
     ⚠️ Correção importante:
       Agora a ordem das requisições é baseada SOMENTE no REQ_CDG,
       que é a ordem real do ERP. Datas não são usadas para ordenar.
     """
+    ctx = _obter_contexto(df, ano, inicio, fim)
+    return _filtro_reqs_subsequentes(
+        estatisticas_analise(ctx, "basicos_reqs_subsequentes", por_ano), min_ligacoes
+    )
 
-    base = _filtrar_basicos_ano(df, ano)
+
+def _estatisticas_reqs_subsequentes(ctx: ContextoBasicos, pre: list) -> pd.DataFrame:
+    base = ctx.base
     if base.empty or "REQ_CDG" not in base.columns or "EMPRD" not in base.columns:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-            "TOTAL_REQS_ITEM", "N_LIGACOES_SUBSEQ", "MAX_SEQ_SUBSEQ"
-        ])
+        return pd.DataFrame(columns=pre + COLS_REQS_SUBSEQ)
 
     # Garantir que REQ_CDG seja numérico para ordenar corretamente
-    base["REQ_CDG"] = pd.to_numeric(base["REQ_CDG"], errors="coerce")
-    base = base.dropna(subset=["REQ_CDG", "EMPRD", "INSUMO_CDG"])
+    base = base[pre + ["EMPRD", "INSUMO_CDG"]].assign(
+        REQ_CDG=pd.to_numeric(base["REQ_CDG"], errors="coerce")
+    ).dropna(subset=["REQ_CDG", "EMPRD", "INSUMO_CDG"])
 
     # Mapa de ordem das REQs por obra usando SOMENTE o REQ_CDG
     reqs = (
-        base[["EMPRD", "REQ_CDG"]]
+        base[pre + ["EMPRD", "REQ_CDG"]]
         .drop_duplicates()
-        .sort_values(["EMPRD", "REQ_CDG"])            # 👈 CORREÇÃO PRINCIPAL
+        .sort_values(pre + ["EMPRD", "REQ_CDG"])            # 👈 CORREÇÃO PRINCIPAL
     )
 
-    reqs["ORD_REQ_OBRA"] = reqs.groupby("EMPRD").cumcount()
+    reqs["ORD_REQ_OBRA"] = reqs.groupby(pre + ["EMPRD"], observed=True).cumcount()
 
-    # Junta de volta na base
-    base = base.merge(
-        reqs[["EMPRD", "REQ_CDG", "ORD_REQ_OBRA"]],
-        on=["EMPRD", "REQ_CDG"],
+    # Uma linha por obra + insumo + REQ, com a ordem da REQ na obra
+    pares = base.drop_duplicates().merge(
+        reqs,
+        on=pre + ["EMPRD", "REQ_CDG"],
         how="left"
     )
 
-    nomes_empr = _mapa_empr_desc(base)
-    nomes_insumo = _mapa_insumo_desc(base)
-
-    resultados = []
+    # Ligações REQ(n) -> REQ(n+1) e maior sequência, para todos os pares de uma vez
+    seq = _sequencias_por_par(pares, pre + ["EMPRD", "INSUMO_CDG"], "ORD_REQ_OBRA")
+    seq = seq[seq["N_VALORES"] >= 2]
 
-    # Avaliar item por item dentro de cada obra
-    for (emprd, ins_cdg), g in base.groupby(["EMPRD", "INSUMO_CDG"]):
-
-        # Pega apenas os códigos de ordem da obra, 1 por REQ
-        ords = (
-            g[["ORD_REQ_OBRA"]]
-            .drop_duplicates()
-            .sort_values("ORD_REQ_OBRA")["ORD_REQ_OBRA"]
-            .to_numpy()
-        )
-
-        total_reqs = len(ords)
-        if total_reqs < 2:
-            continue
-
-        diffs = np.diff(ords)
-
-        # quantas vezes houve proximidade 1
-        n_links = int((diffs == 1).sum())
-
-        # maior sequência contínua
-        max_seq = 1
-        atual = 1
-        for d in diffs:
-            if d == 1:
-                atual += 1
-                max_seq = max(max_seq, atual)
-            else:
-                atual = 1
-
-        if n_links >= int(min_ligacoes):
-            resultados.append({
-                "EMPRD": emprd,
-                "INSUMO_CDG": ins_cdg,
-                "TOTAL_REQS_ITEM": int(total_reqs),
-                "N_LIGACOES_SUBSEQ": int(n_links),
-                "MAX_SEQ_SUBSEQ": int(max_seq),
-            })
-
-    if not resultados:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-            "TOTAL_REQS_ITEM", "N_LIGACOES_SUBSEQ", "MAX_SEQ_SUBSEQ"
-        ])
-
-    out = pd.DataFrame(resultados)
-    out = (
-        out.merge(nomes_empr, on="EMPRD", how="left")
-           .merge(nomes_insumo, on="INSUMO_CDG", how="left")
+    resultados = seq[pre + ["EMPRD", "INSUMO_CDG"]].assign(
+        TOTAL_REQS_ITEM=seq["N_VALORES"].astype(np.int64),
+        N_LIGACOES_SUBSEQ=seq["N_LIGACOES"].astype(np.int64),
+        MAX_SEQ_SUBSEQ=seq["MAX_SEQ"].astype(np.int64),
     )
 
-    cols = [
-        "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-        "TOTAL_REQS_ITEM", "N_LIGACOES_SUBSEQ", "MAX_SEQ_SUBSEQ"
-    ]
+    out = _anexar_nomes(resultados, ctx)
+    return out[pre + COLS_REQS_SUBSEQ]
 
-    return out[cols].sort_values(
-        ["N_LIGACOES_SUBSEQ", "MAX_SEQ_SUBSEQ", "TOTAL_REQS_ITEM"],
-        ascending=[False, False, False]
-    ).reset_index(drop=True)
+
+def _filtro_reqs_subsequentes(estatisticas: pd.DataFrame, min_ligacoes: int = 1) -> pd.DataFrame:
+    manter = estatisticas["N_LIGACOES_SUBSEQ"] >= int(min_ligacoes)
+    return _saida_filtrada(estatisticas, manter, "basicos_reqs_subsequentes", COLS_REQS_SUBSEQ)
 
 
 # ============================================================
 # 4) Básicos com recorrência semanal por obra
 # ============================================================
+@instrumentar()
 def basicos_semanal_por_obra(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, ContextoBasicos],
     ano: Optional[int] = None,
     min_semanas: int = 4,
-    exigir_consecutivas: bool = False
+    exigir_consecutivas: bool = False,
+    por_ano: bool = False,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
 ) -> pd.DataFrame:
     """
     Itens básicos que aparecem em várias semanas do ano para a mesma obra.
@@ -303,108 +1299,67 @@ def basicos_semanal_por_obra(
     de pelo menos `min_semanas` semanas consecutivas.
     Caso contrário, basta ter aparecido em >= min_semanas semanas distintas.
 
+    Com `ano` (ou `por_ano=True`), entram as semanas ISO daquele ano. Com uma
+    janela `inicio` / `fim`, entram todas as semanas da janela. As semanas
+    são contadas sem interrupção (SEMANA_IDX), então uma sequência que passa
+    da semana 52 para a semana 1 do ano seguinte continua a mesma.
+
     Saída:
       EMPRD | EMPRD_DESC | INSUMO_CDG | INSUMO_DESC
       | SEMANAS_DISTINTAS | MAX_SEQ_SEMANAS
     """
-    base = _filtrar_basicos_ano(df, ano)
-    if base.empty:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-            "SEMANAS_DISTINTAS", "MAX_SEQ_SEMANAS"
-        ])
+    ctx = _obter_contexto(df, ano, inicio, fim)
+    return _filtro_semanal(
+        estatisticas_analise(ctx, "basicos_semanal_por_obra", por_ano), min_semanas, exigir_consecutivas
+    )
 
-    base["REQ_DATA_DT"] = pd.to_datetime(base["REQ_DATA"], errors="coerce")
-    base = base.dropna(subset=["REQ_DATA_DT", "EMPRD", "INSUMO_CDG"])
 
-    # semana ISO
-    iso = base["REQ_DATA_DT"].dt.isocalendar()
-    base["ANO_ISO"] = iso.year
-    base["SEMANA_ISO"] = iso.week
+def _estatisticas_semanal(ctx: ContextoBasicos, pre: list) -> pd.DataFrame:
+    if ctx.base.empty:
+        return pd.DataFrame(columns=pre + COLS_SEMANAL)
 
-    if ano is not None:
-        base = base[base["ANO_ISO"] == int(ano)]
+    # Dias em que o par aparece (cubo); as semanas saem deles
+    base = cubo_incidencia(ctx, bool(pre))
 
-    if base.empty:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-            "SEMANAS_DISTINTAS", "MAX_SEQ_SEMANAS"
-        ])
+    # Semanas do ano ISO pedido (com janela, vale a janela)
+    if pre:
+        base = base[base["ANO_ISO"] == base["ANO"]]
+    elif ctx.ano is not None and not ctx.tem_janela:
+        base = base[base["ANO_ISO"] == ctx.ano]
 
-    dedup = base.drop_duplicates(subset=["EMPRD", "INSUMO_CDG", "SEMANA_ISO"])
+    # Semanas distintas (popcount) e maior sequência (shift + AND) no bitset de cada par
+    semanas = semanas_por_par(base, pre + ["EMPRD", "INSUMO_CDG"], pre)
 
-    nomes_empr = _mapa_empr_desc(base)
-    nomes_insumo = _mapa_insumo_desc(base)
+    resultados = semanas.chaves.assign(
+        SEMANAS_DISTINTAS=semanas.semanas_distintas(),
+        MAX_SEQ_SEMANAS=semanas.maior_sequencia(),
+    )
 
-    resultados = []
-    for (emprd, ins_cdg), g in dedup.groupby(["EMPRD", "INSUMO_CDG"]):
-        semanas = np.sort(g["SEMANA_ISO"].to_numpy())
-        if len(semanas) == 0:
-            continue
+    out = _anexar_nomes(resultados, ctx)
+    return out[pre + COLS_SEMANAL]
 
-        semanas_distintas = int(len(semanas))
 
-        # maior sequência consecutiva de semanas
-        if len(semanas) == 1:
-            max_seq = 1
-        else:
-            diffs = np.diff(semanas)
-            max_seq = 1
-            atual = 1
-            for d in diffs:
-                if d == 1:
-                    atual += 1
-                    if atual > max_seq:
-                        max_seq = atual
-                else:
-                    atual = 1
-
-        if exigir_consecutivas:
-            if max_seq >= int(min_semanas):
-                resultados.append({
-                    "EMPRD": emprd,
-                    "INSUMO_CDG": ins_cdg,
-                    "SEMANAS_DISTINTAS": semanas_distintas,
-                    "MAX_SEQ_SEMANAS": int(max_seq),
-                })
-        else:
-            if semanas_distintas >= int(min_semanas):
-                resultados.append({
-                    "EMPRD": emprd,
-                    "INSUMO_CDG": ins_cdg,
-                    "SEMANAS_DISTINTAS": semanas_distintas,
-                    "MAX_SEQ_SEMANAS": int(max_seq),
-                })
-
-    if not resultados:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-            "SEMANAS_DISTINTAS", "MAX_SEQ_SEMANAS"
-        ])
-
-    out = pd.DataFrame(resultados)
-    out = (
-        out.merge(nomes_empr, on="EMPRD", how="left")
-           .merge(nomes_insumo, on="INSUMO_CDG", how="left")
-    )
-
-    cols = [
-        "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-        "SEMANAS_DISTINTAS", "MAX_SEQ_SEMANAS"
-    ]
-    return out[cols].sort_values(
-        ["MAX_SEQ_SEMANAS", "SEMANAS_DISTINTAS"],
-        ascending=[False, False]
-    ).reset_index(drop=True)
+def _filtro_semanal(
+    estatisticas: pd.DataFrame,
+    min_semanas: int = 4,
+    exigir_consecutivas: bool = False
+) -> pd.DataFrame:
+    col = "MAX_SEQ_SEMANAS" if exigir_consecutivas else "SEMANAS_DISTINTAS"
+    manter = estatisticas[col] >= int(min_semanas)
+    return _saida_filtrada(estatisticas, manter, "basicos_semanal_por_obra", COLS_SEMANAL)
 
 
 # ============================================================
 # 5) Intervalo médio entre pedidos de básicos (por obra + insumo)
 # ============================================================
+@instrumentar()
 def intervalo_medio_entre_pedidos_basicos(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, ContextoBasicos],
     ano: Optional[int] = None,
-    min_reqs: int = 2
+    min_reqs: int = 2,
+    por_ano: bool = False,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
 ) -> pd.DataFrame:
     """
     Para cada obra + insumo básico, calcula:
@@ -414,108 +1369,86 @@ def intervalo_medio_entre_pedidos_basicos(
       - INTERVALO_MAX_DIAS
 
     Considera datas de REQ (normalizadas em dia).
+    Com `por_ano=True`, os intervalos são calculados dentro de cada ano
+    e a saída ganha a coluna ANO.
     """
-    base = _filtrar_basicos_ano(df, ano)
-    if base.empty or "REQ_CDG" not in base.columns:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-            "TOTAL_REQS_ITEM", "INTERVALO_MEDIO_DIAS",
-            "INTERVALO_MIN_DIAS", "INTERVALO_MAX_DIAS"
-        ])
+    ctx = _obter_contexto(df, ano, inicio, fim)
+    return _filtro_intervalo(
+        estatisticas_analise(ctx, "intervalo_medio_entre_pedidos", por_ano), min_reqs
+    )
 
-    base["REQ_DATA_DT"] = pd.to_datetime(base["REQ_DATA"], errors="coerce").dt.normalize()
-    base = base.dropna(subset=["REQ_DATA_DT", "EMPRD", "INSUMO_CDG", "REQ_CDG"])
 
-    # por obra + insumo, REQs distintas e ordenadas
-    dedup = base.drop_duplicates(subset=["EMPRD", "INSUMO_CDG", "REQ_CDG"])
+def _estatisticas_intervalo(ctx: ContextoBasicos, pre: list) -> pd.DataFrame:
+    if ctx.base.empty or "REQ_CDG" not in ctx.base.columns:
+        return pd.DataFrame(columns=pre + COLS_INTERVALO)
 
-    nomes_empr = _mapa_empr_desc(base)
-    nomes_insumo = _mapa_insumo_desc(base)
+    # por obra + insumo, dias com REQ (cubo); datas como número inteiro de dias (DIA)
+    cubo = cubo_incidencia(ctx, bool(pre))
+    dias = cubo[cubo["N_REQS"] > 0][pre + ["EMPRD", "INSUMO_CDG", "DIA"]]
 
-    resultados = []
-    for (emprd, ins_cdg), g in dedup.groupby(["EMPRD", "INSUMO_CDG"]):
-        datas = (
-            g[["REQ_DATA_DT"]]
-            .dropna()
-            .drop_duplicates()
-            .sort_values("REQ_DATA_DT")["REQ_DATA_DT"]
-            .to_numpy()
-        )
-        if len(datas) < int(min_reqs):
-            continue
+    # Diferenças entre datas distintas consecutivas, para todos os pares de uma vez
+    seq = _sequencias_por_par(dias, pre + ["EMPRD", "INSUMO_CDG"], "DIA")
+    seq = seq[seq["N_VALORES"] >= 2]
 
-        diffs = (datas[1:] - datas[:-1]).astype("timedelta64[D]").astype(int)
-        if len(diffs) == 0:
-            continue
-
-        resultados.append({
-            "EMPRD": emprd,
-            "INSUMO_CDG": ins_cdg,
-            "TOTAL_REQS_ITEM": int(len(datas)),
-            "INTERVALO_MEDIO_DIAS": float(np.mean(diffs)),
-            "INTERVALO_MIN_DIAS": int(np.min(diffs)),
-            "INTERVALO_MAX_DIAS": int(np.max(diffs)),
-        })
-
-    if not resultados:
-        return pd.DataFrame(columns=[
-            "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-            "TOTAL_REQS_ITEM", "INTERVALO_MEDIO_DIAS",
-            "INTERVALO_MIN_DIAS", "INTERVALO_MAX_DIAS"
-        ])
-
-    out = pd.DataFrame(resultados)
-    out = (
-        out.merge(nomes_empr, on="EMPRD", how="left")
-           .merge(nomes_insumo, on="INSUMO_CDG", how="left")
+    resultados = seq[pre + ["EMPRD", "INSUMO_CDG"]].assign(
+        TOTAL_REQS_ITEM=seq["N_VALORES"].astype(np.int64),
+        INTERVALO_MEDIO_DIAS=seq["DIFF_MEDIA"].astype(np.float64).round(2),
+        INTERVALO_MIN_DIAS=seq["DIFF_MIN"].astype(np.int64),
+        INTERVALO_MAX_DIAS=seq["DIFF_MAX"].astype(np.int64),
     )
 
-    cols = [
-        "EMPRD", "EMPRD_DESC", "INSUMO_CDG", "INSUMO_DESC",
-        "TOTAL_REQS_ITEM", "INTERVALO_MEDIO_DIAS",
-        "INTERVALO_MIN_DIAS", "INTERVALO_MAX_DIAS"
-    ]
-    out["INTERVALO_MEDIO_DIAS"] = out["INTERVALO_MEDIO_DIAS"].round(2)
+    out = _anexar_nomes(resultados, ctx)
+    return out[pre + COLS_INTERVALO]
 
-    return out[cols].sort_values(
-        ["INTERVALO_MEDIO_DIAS", "TOTAL_REQS_ITEM"],
-        ascending=[True, False]
-    ).reset_index(drop=True)
+
+def _filtro_intervalo(estatisticas: pd.DataFrame, min_reqs: int = 2) -> pd.DataFrame:
+    manter = estatisticas["TOTAL_REQS_ITEM"] >= max(int(min_reqs), 2)
+    return _saida_filtrada(estatisticas, manter, "intervalo_medio_entre_pedidos", COLS_INTERVALO)
 
 
 # ============================================================
 # 6) Itens básicos de pequena quantidade e alta frequência (geral)
 #    (generalização da sua função 2025)
 # ============================================================
+@instrumentar()
 def itens_basicos_pequenas_qtds_alta_frequencia(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, ContextoBasicos],
     ano: Optional[int] = None,
     min_pedidos: int = 5,
-    max_media_qtd: float = 10.0
+    max_media_qtd: float = 10.0,
+    por_ano: bool = False,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
 ) -> pd.DataFrame:
     """
     Itens básicos comprados muitas vezes mas em pequena quantidade média.
 
     Parâmetros:
         ano          : filtra por ano da REQ (None = todos)
+        inicio, fim  : janela [inicio, fim) de REQ_DATA (None = sem limite)
         min_pedidos  : mínimo de requisições com o item
         max_media_qtd: máximo da média de quantidade por pedido
+        por_ano      : agrega cada ano separadamente (coluna ANO na saída)
 
     Saída:
         INSUMO_CDG | INSUMO_DESC | pedidos | media_qtd | qtd_total | vezes_distintas
     """
-    base = _filtrar_basicos_ano(df, ano)
+    ctx = _obter_contexto(df, ano, inicio, fim)
+    return _filtro_pingados(
+        estatisticas_analise(ctx, "itens_pequena_qtd_alta_freq", por_ano), min_pedidos, max_media_qtd
+    )
+
+
+def _estatisticas_pingados(ctx: ContextoBasicos, pre: list) -> pd.DataFrame:
+    base = ctx.base
     if base.empty:
-        return pd.DataFrame(columns=[
-            "INSUMO_CDG", "INSUMO_DESC",
-            "pedidos", "media_qtd", "qtd_total", "vezes_distintas"
-        ])
+        return pd.DataFrame(columns=pre + COLS_PINGADOS)
 
-    base["QTD_PED"] = pd.to_numeric(base.get("QTD_PED"), errors="coerce")
-    base = base.dropna(subset=["QTD_PED", "INSUMO_CDG", "INSUMO_DESC"])
+    base = _base_pingados(base)
 
-    g = (
-        base.groupby(["INSUMO_CDG", "INSUMO_DESC"])
+    # media_qtd sem arredondar: o limiar compara o valor exato
+    return (
+        base.groupby(pre + ["INSUMO_CDG", "INSUMO_DESC"], observed=True)
         .agg(
             pedidos=("REQ_CDG", "count"),
             media_qtd=("QTD_PED", "mean"),
@@ -525,26 +1458,210 @@ def itens_basicos_pequenas_qtds_alta_frequencia(
         .reset_index()
     )
 
+
+def _filtro_pingados(estatisticas: pd.DataFrame, min_pedidos: int = 5, max_media_qtd: float = 10.0) -> pd.DataFrame:
+    return _filtrar_pingados(estatisticas, min_pedidos, max_media_qtd, _tem_ano(estatisticas))
+
+
+def _base_pingados(base: pd.DataFrame) -> pd.DataFrame:
+    # float64 mesmo na base compacta: soma/média acumulam em dupla precisão
+    base = base.assign(QTD_PED=pd.to_numeric(base.get("QTD_PED"), errors="coerce").astype(np.float64))
+    return base.dropna(subset=["QTD_PED", "INSUMO_CDG", "INSUMO_DESC"])
+
+
+def _filtrar_pingados(g: pd.DataFrame, min_pedidos: int, max_media_qtd: float, pre: list) -> pd.DataFrame:
     out = g[
         (g["pedidos"] >= int(min_pedidos)) &
         (g["media_qtd"] <= float(max_media_qtd))
     ].copy()
 
     out["media_qtd"] = out["media_qtd"].round(3)
+    # Sem o ruído da ordem de soma (pandas, DuckDB e partições somam em ordens
+    # diferentes), preservando as casas decimais das quantidades do ERP
+    out["qtd_total"] = out["qtd_total"].round(6)
+
+    return _ordenar_saida(out, "itens_pequena_qtd_alta_freq", pre)
+
+
+# Etapas de cada tabela do painel: (estatísticas, filtro)
+ETAPAS_ANALISE = {
+    "basicos_reqs_mes": (_estatisticas_reqs_mes, _filtro_reqs_mes),
+    "basicos_reqs_subsequentes": (_estatisticas_reqs_subsequentes, _filtro_reqs_subsequentes),
+    "basicos_semanal_por_obra": (_estatisticas_semanal, _filtro_semanal),
+    "intervalo_medio_entre_pedidos": (_estatisticas_intervalo, _filtro_intervalo),
+    "itens_pequena_qtd_alta_freq": (_estatisticas_pingados, _filtro_pingados),
+}
+
+
+def estatisticas_analise(
+    df: Union[pd.DataFrame, ContextoBasicos],
+    chave: str,
+    por_ano: bool = False,
+    ano: Optional[int] = None,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> pd.DataFrame:
+    """
+    Estatísticas (sem limiar) de uma tabela do painel, guardadas no contexto:
+    chamadas seguintes com o mesmo contexto não recalculam nada. A tabela
+    final sai de `filtrar_analise(chave, estatisticas, **limiares)`.
+    """
+    ctx = _obter_contexto(df, ano, inicio, fim)
+    if (chave, por_ano) not in ctx._estatisticas:
+        estatisticas = ETAPAS_ANALISE[chave][0]
+        with etapa(f"estatisticas[{chave}]", len(ctx.base)) as e:
+            ctx._estatisticas[(chave, por_ano)] = estatisticas(ctx, _prefixo_ano(por_ano))
+            if e is not None:
+                e.linhas_saida = len(ctx._estatisticas[(chave, por_ano)])
+    return ctx._estatisticas[(chave, por_ano)]
+
 
-    return out.sort_values(["pedidos", "media_qtd"], ascending=[False, True]).reset_index(drop=True)
+def filtrar_analise(chave: str, estatisticas: pd.DataFrame, **limiares) -> pd.DataFrame:
+    """Aplica os limiares (os mesmos parâmetros da análise) às estatísticas de `estatisticas_analise`."""
+    return ETAPAS_ANALISE[chave][1](estatisticas, **limiares)
 
 
 # ============================================================
 # 7) Painel consolidado de recorrência de básicos
 # ============================================================
+# Análises do painel e os limiares usados em cada uma
+ANALISES_PAINEL = [
+    ("basicos_reqs_mes", basicos_reqs_mes, {"min_reqs_mes": 2}),
+    ("basicos_reqs_subsequentes", basicos_reqs_subsequentes, {"min_ligacoes": 1}),
+    ("basicos_semanal_por_obra", basicos_semanal_por_obra, {"min_semanas": 4, "exigir_consecutivas": False}),
+    ("intervalo_medio_entre_pedidos", intervalo_medio_entre_pedidos_basicos, {"min_reqs": 2}),
+    ("itens_pequena_qtd_alta_freq", itens_basicos_pequenas_qtds_alta_frequencia,
+     {"min_pedidos": 5, "max_media_qtd": 10.0}),
+]
+
+LIMIARES_PADRAO = {chave: limiares for chave, _, limiares in ANALISES_PAINEL}
+
+
+def limiares_painel(limiares: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Limiares de cada tabela do painel: os padrão (LIMIARES_PADRAO) com os de
+    `limiares` por cima, ex.: {"basicos_semanal_por_obra": {"min_semanas": 6}}.
+    """
+    limiares = limiares or {}
+    desconhecidas = set(limiares) - set(LIMIARES_PADRAO)
+    if desconhecidas:
+        raise KeyError(f"Tabelas desconhecidas em limiares: {sorted(desconhecidas)}")
+    return {chave: {**padrao, **limiares.get(chave, {})} for chave, padrao in LIMIARES_PADRAO.items()}
+
+
+MODOS_PARALELO = ("thread", "process")
+
+
+def _executor(paralelo: str, max_workers: Optional[int]):
+    if paralelo == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if paralelo == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"paralelo deve ser None ou um de {MODOS_PARALELO}, recebido {paralelo!r}")
+
+
+def tabela_painel(
+    df: Union[pd.DataFrame, ContextoBasicos],
+    chave: str,
+    ano: Optional[int] = None,
+    por_ano: bool = False,
+    inicio: DataJanela = None,
+    fim: DataJanela = None,
+    limiares: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    """
+    Uma única tabela do painel (ex.: "basicos_reqs_mes"), com os limiares do
+    painel (`limiares` substitui alguns deles, ex.: {"min_reqs_mes": 3}).
+    """
+    for nome, func, padrao in ANALISES_PAINEL:
+        if nome == chave:
+            return func(df, ano, por_ano=por_ano, inicio=inicio, fim=fim, **{**padrao, **(limiares or {})})
+    raise KeyError(chave)
+
+
+def _tabelas_painel(
+    ctx: ContextoBasicos,
+    por_ano: bool = False,
+    paralelo: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    limiares: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, pd.DataFrame]:
+    limiares = limiares_painel(limiares)
+
+    # As análises são independentes e só leem o contexto: com `paralelo`,
+    # cada uma roda numa tarefa do pool e o resultado é montado na mesma ordem
+    if paralelo is None:
+        return {
+            chave: func(ctx, por_ano=por_ano, **limiares[chave])
+            for chave, func, _ in ANALISES_PAINEL
+        }
+
+    with _executor(paralelo, max_workers) as pool:
+        # Threads rodam numa cópia do contexto atual: herdam o relatório de
+        # desempenho ativo (ver instrumentacao); processos não são medidos
+        def submeter(func, *args, **kwargs):
+            if paralelo == "thread":
+                return pool.submit(contextvars.copy_context().run, func, *args, **kwargs)
+            return pool.submit(func, *args, **kwargs)
+
+        futuros = {
+            chave: submeter(func, ctx, por_ano=por_ano, **limiares[chave])
+            for chave, func, _ in ANALISES_PAINEL
+        }
+        return {chave: f.result() for chave, f in futuros.items()}
+
+
+def _resumo_indicadores(ano: Optional[int], tabelas: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    # Tabela ausente (painel preguiçoso ainda não calculou) -> None
+    def n_itens(chave: str) -> Optional[int]:
+        t = tabelas.get(chave)
+        if t is None:
+            return None
+        return int(t["INSUMO_CDG"].nunique()) if not t.empty else 0
+
+    return {
+        "ano": int(ano) if ano is not None else None,
+        "qtd_itens_2plus_reqs_mes": n_itens("basicos_reqs_mes"),
+        "qtd_itens_com_reqs_subsequentes": n_itens("basicos_reqs_subsequentes"),
+        "qtd_itens_semanal_obra": n_itens("basicos_semanal_por_obra"),
+        "qtd_itens_com_intervalo_calculado": n_itens("intervalo_medio_entre_pedidos"),
+        "qtd_itens_pequena_qtd_alta_freq": n_itens("itens_pequena_qtd_alta_freq"),
+    }
+
+
+MOTORES = ("pandas", "duckdb")
+
+
+@instrumentar()
 def painel_recorrencia_basicos(
     df: pd.DataFrame,
-    ano: Optional[int] = 2025
+    ano: Optional[int] = 2025,
+    paralelo: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    motor: str = "pandas",
+    inicio: DataJanela = None,
+    fim: DataJanela = None,
+    limiares: Optional[Dict[str, Dict[str, Any]]] = None
 ) -> Dict[str, Any]:
     """
     Orquestra as principais análises de recorrência de materiais básicos
-    para um determinado ano.
+    para um determinado ano e/ou janela de datas [inicio, fim).
+
+    Para uma janela que cruza anos (ex.: 12 meses móveis, ver `janela_movel`),
+    passe ano=None: ano e janela se combinam.
+
+    paralelo: None (sequencial), "thread" ou "process" — roda as cinco
+    análises ao mesmo tempo num pool com até `max_workers` workers. No modo
+    "process" o contexto é serializado uma vez para cada tarefa. Com um
+    RelatorioDesempenho ativo, as etapas das threads entram no relatório;
+    as dos processos, não.
+
+    limiares: substitui limiares do painel por tabela (ver `limiares_painel`).
+
+    motor: "pandas" (padrão) ou "duckdb" — as mesmas tabelas calculadas por
+    consultas SQL (ver motor_duckdb). Com "duckdb", `df` também pode ser o
+    caminho do snapshot Feather, sem carregar a base no pandas. O DuckDB
+    usa as próprias threads: `paralelo` / `max_workers` com "duckdb" são erro.
 
     Retorna um dict com:
       - "basicos_reqs_mes"
@@ -554,32 +1671,176 @@ def painel_recorrencia_basicos(
       - "itens_pequena_qtd_alta_freq"
       - "resumo_indicadores" (dicionário com números-chave)
     """
-    df_mes = basicos_reqs_mes(df, ano=ano, min_reqs_mes=2)
-    df_subseq = basicos_reqs_subsequentes(df, ano=ano, min_ligacoes=1)
-    df_semana = basicos_semanal_por_obra(df, ano=ano, min_semanas=4, exigir_consecutivas=False)
-    df_intervalos = intervalo_medio_entre_pedidos_basicos(df, ano=ano, min_reqs=2)
-    df_pingados = itens_basicos_pequenas_qtds_alta_frequencia(df, ano=ano, min_pedidos=5, max_media_qtd=10.0)
+    if motor == "duckdb":
+        if paralelo is not None or max_workers is not None:
+            raise ValueError(
+                "paralelo/max_workers não se aplicam ao motor 'duckdb' (ele paraleliza as consultas sozinho)."
+            )
+        from motor_duckdb import painel_recorrencia_basicos_duckdb
+        return painel_recorrencia_basicos_duckdb(df, ano, inicio, fim, limiares)
+    if motor != "pandas":
+        raise ValueError(f"motor deve ser um de {MOTORES}, recebido {motor!r}")
 
-    resumo = {
-        "ano": int(ano) if ano is not None else None,
-        "qtd_itens_2plus_reqs_mes": int(df_mes["INSUMO_CDG"].nunique()) if not df_mes.empty else 0,
-        "qtd_itens_com_reqs_subsequentes": int(df_subseq["INSUMO_CDG"].nunique()) if not df_subseq.empty else 0,
-        "qtd_itens_semanal_obra": int(df_semana["INSUMO_CDG"].nunique()) if not df_semana.empty else 0,
-        "qtd_itens_com_intervalo_calculado": int(df_intervalos["INSUMO_CDG"].nunique()) if not df_intervalos.empty else 0,
-        "qtd_itens_pequena_qtd_alta_freq": int(df_pingados["INSUMO_CDG"].nunique()) if not df_pingados.empty else 0,
-    }
+    # Filtro, datas e nomes preparados uma vez para as cinco análises
+    ctx = preparar_contexto_basicos(df, ano, inicio, fim)
+
+    tabelas = _tabelas_painel(ctx, paralelo=paralelo, max_workers=max_workers, limiares=limiares)
 
     return {
-        "basicos_reqs_mes": df_mes,
-        "basicos_reqs_subsequentes": df_subseq,
-        "basicos_semanal_por_obra": df_semana,
-        "intervalo_medio_entre_pedidos": df_intervalos,
-        "itens_pequena_qtd_alta_freq": df_pingados,
-        "resumo_indicadores": resumo,
+        **tabelas,
+        "resumo_indicadores": _resumo_indicadores(ano, tabelas),
+    }
+
+
+def painel_recorrencia_basicos_persistente(
+    ano: Optional[int] = 2025,
+    inicio: DataJanela = None,
+    fim: DataJanela = None,
+    limiares: Optional[Dict[str, Dict[str, Any]]] = None,
+    diretorio: Optional[Path] = None,
+    orcamento_mb: float = ORCAMENTO_PADRAO_MB,
+    **opcoes
+) -> Dict[str, Any]:
+    """
+    `painel_recorrencia_basicos` guardado em disco (ver cache_resultados),
+    por planilhas de origem + período + limiares + versão do código. Um
+    painel já calculado, mesmo em outro processo ou antes de um reinício,
+    volta do disco sem carregar a base.
+
+    `opcoes` (paralelo, max_workers, motor) só mudam como o painel é
+    calculado, não o resultado.
+    """
+    base_dir = Path(diretorio) if diretorio is not None else get_base_dir()
+    inicio, fim = _limites_janela(inicio, fim)
+    cache = cache_do_diretorio(base_dir, orcamento_mb)
+
+    impressao = impressao_digital_bases(base_dir)
+    chave = chave_resultado(impressao, ano, inicio, fim, limiares_painel(limiares)) if impressao else None
+    painel = cache.ler(chave) if chave else None
+
+    if painel is None:
+        painel = painel_recorrencia_basicos(
+            carregar_bases(diretorio=base_dir), ano, inicio=inicio, fim=fim, limiares=limiares, **opcoes
+        )
+        # Planilha trocada durante a carga: o painel não é da impressão calculada antes
+        if chave and impressao_digital_bases(base_dir) == impressao:
+            cache.gravar(chave, painel)
+    return painel
+
+
+@instrumentar()
+def painel_recorrencia_basicos_todos_anos(
+    df: pd.DataFrame,
+    paralelo: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    inicio: DataJanela = None,
+    fim: DataJanela = None,
+    limiares: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Calcula as tabelas do painel para todos os anos numa única passada: o ano
+    da REQ entra nas chaves de agrupamento (coluna ANO). O painel de cada ano
+    sai depois por `painel_do_ano`, sem recalcular nada.
+
+    inicio / fim / limiares: como em `painel_recorrencia_basicos`; a janela
+    [inicio, fim) restringe as REQs de todos os anos.
+    """
+    ctx = preparar_contexto_basicos(df, None, inicio, fim)
+    return _tabelas_painel(
+        ctx, por_ano=True, paralelo=paralelo, max_workers=max_workers, limiares=limiares
+    )
+
 
+def painel_do_ano(tabelas_todos_anos: Dict[str, pd.DataFrame], ano: int) -> Dict[str, Any]:
+    """
+    Recorta o resultado de `painel_recorrencia_basicos_todos_anos` para um ano,
+    no mesmo formato de `painel_recorrencia_basicos(df, ano)`.
+    """
+    tabelas = {
+        chave: fatia_do_ano(t, ano)
+        for chave, t in tabelas_todos_anos.items()
     }
 
+    return {
+        **tabelas,
+        "resumo_indicadores": _resumo_indicadores(ano, tabelas),
+    }
 
 
+def fatia_do_ano(tabela_todos_anos: pd.DataFrame, ano: int) -> pd.DataFrame:
+    """Linhas de um ano de uma tabela calculada com `por_ano=True`, sem a coluna ANO."""
+    t = tabela_todos_anos
+    fatia = t[t["ANO"] == int(ano)] if not t.empty else t
+    return fatia.drop(columns="ANO").reset_index(drop=True)
+
+
+# ============================================================
+# 8) Painel preguiçoso: cada tabela calculada no primeiro acesso
+# ============================================================
+CHAVES_PAINEL = [chave for chave, _, _ in ANALISES_PAINEL]
+
+
+class PainelPreguicoso(Mapping):
+    """
+    Painel com as mesmas chaves do dict de `painel_recorrencia_basicos`, mas
+    cada tabela só é calculada (e guardada) quando é acessada pela primeira vez.
+
+    `calcular(chave)` devolve a tabela pedida. "resumo_indicadores" usa só as
+    tabelas já calculadas (None nas demais); `resumo(chaves)` calcula antes as
+    tabelas pedidas.
+    """
+
+    def __init__(self, calcular: Callable[[str], pd.DataFrame], ano: Optional[int]):
+        self._calcular = calcular
+        self.ano = ano
+        self._tabelas: Dict[str, pd.DataFrame] = {}
+
+    def __getitem__(self, chave: str) -> Any:
+        if chave == "resumo_indicadores":
+            return self.resumo([])
+        if chave not in CHAVES_PAINEL:
+            raise KeyError(chave)
+        if chave not in self._tabelas:
+            self._tabelas[chave] = self._calcular(chave)
+        return self._tabelas[chave]
+
+    def __contains__(self, chave: object) -> bool:
+        # Só confere a chave: o Mapping padrão chamaria __getitem__ (e calcularia a tabela)
+        return chave in CHAVES_PAINEL or chave == "resumo_indicadores"
+
+    def __iter__(self):
+        return iter(CHAVES_PAINEL + ["resumo_indicadores"])
+
+    def __len__(self) -> int:
+        return len(CHAVES_PAINEL) + 1
+
+    @property
+    def calculadas(self) -> list:
+        return [c for c in CHAVES_PAINEL if c in self._tabelas]
+
+    def resumo(self, chaves: Optional[list] = None) -> Dict[str, Any]:
+        """Resumo das tabelas já calculadas mais as `chaves` pedidas (None = todas)."""
+        for chave in (CHAVES_PAINEL if chaves is None else chaves):
+            self[chave]
+        return _resumo_indicadores(self.ano, self._tabelas)
+
+
+def painel_recorrencia_basicos_preguicoso(
+    df: pd.DataFrame,
+    ano: Optional[int] = 2025,
+    inicio: DataJanela = None,
+    fim: DataJanela = None
+) -> PainelPreguicoso:
+    """
+    Versão preguiçosa de `painel_recorrencia_basicos`: o contexto do ano é
+    preparado no primeiro acesso e cada análise roda só quando a sua tabela
+    é pedida.
+    """
+    contexto = []
 
+    def calcular(chave: str) -> pd.DataFrame:
+        if not contexto:
+            contexto.append(preparar_contexto_basicos(df, ano, inicio, fim))
+        return tabela_painel(contexto[0], chave)
 
+    return PainelPreguicoso(calcular, ano)
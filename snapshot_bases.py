@@ -0,0 +1,218 @@
+# snapshot_bases.py
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Any, Tuple
+
+import pandas as pd
+
+# Pasta (dentro do diretório das planilhas) onde ficam os snapshots
+PASTA_SNAPSHOT = ".cache_recorrencia"
+ARQUIVO_SNAPSHOT = "base_erp.feather"
+ARQUIVO_META = "base_erp.json"
+
+# Incrementar quando o tratamento de carregar_bases mudar o formato da base
+VERSAO_SNAPSHOT = 2
+
+
+def _hash_arquivo(caminho: Path) -> str:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _assinatura_arquivo(caminho: Path, anterior: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Tamanho, mtime e hash do conteúdo de um arquivo.
+
+    Se tamanho e mtime baterem com a assinatura `anterior`, reaproveita o hash
+    já calculado (evita reler a planilha inteira a cada carga).
+    """
+    st = caminho.stat()
+    if (
+        anterior is not None
+        and anterior.get("tamanho") == st.st_size
+        and anterior.get("mtime_ns") == st.st_mtime_ns
+    ):
+        return dict(anterior)
+
+    return {
+        "tamanho": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": _hash_arquivo(caminho),
+    }
+
+
+def _ler_meta(pasta: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(pasta / ARQUIVO_META, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("versao") != VERSAO_SNAPSHOT:
+        return None
+    return meta
+
+
+def assinaturas_fontes(fontes: Iterable[Path], meta: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Assinatura (tamanho/mtime/sha256) de cada planilha de origem, por nome de arquivo."""
+    anteriores = (meta or {}).get("arquivos", {})
+    return {
+        Path(c).name: _assinatura_arquivo(Path(c), anteriores.get(Path(c).name))
+        for c in fontes
+    }
+
+
+def impressao_digital(assinaturas: Dict[str, Dict[str, Any]]) -> str:
+    """Hash único do conjunto de planilhas (só depende do conteúdo)."""
+    h = hashlib.sha256()
+    for nome in sorted(assinaturas):
+        h.update(nome.encode("utf-8"))
+        h.update(assinaturas[nome]["sha256"].encode("ascii"))
+    return h.hexdigest()
+
+
+def assinaturas_atuais(base_dir: Path, fontes: Iterable[Path]) -> Dict[str, Dict[str, Any]]:
+    """
+    Assinaturas atuais das planilhas, reaproveitando os hashes da meta do
+    snapshot quando tamanho e mtime não mudaram. OSError se alguma não puder
+    ser lida.
+    """
+    return assinaturas_fontes(fontes, _ler_meta(Path(base_dir) / PASTA_SNAPSHOT))
+
+
+def impressao_digital_fontes(base_dir: Path, fontes: Iterable[Path]) -> Optional[str]:
+    """
+    Impressão digital atual das planilhas, sem carregar a base (ver
+    `assinaturas_atuais`). None se alguma planilha não puder ser lida.
+    """
+    try:
+        return impressao_digital(assinaturas_atuais(base_dir, fontes))
+    except OSError:
+        return None
+
+
+def _ler_feather(pasta: Path) -> Optional[pd.DataFrame]:
+    try:
+        from pyarrow import feather
+
+        tabela = feather.read_table(pasta / ARQUIVO_SNAPSHOT, memory_map=True)
+        return tabela.to_pandas()
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def ler_snapshot(base_dir: Path, fontes: Iterable[Path]) -> Optional[pd.DataFrame]:
+    """
+    Devolve a base tratada gravada em disco se as planilhas de origem não
+    mudaram desde a gravação. Caso contrário (ou sem pyarrow), devolve None.
+
+    O Feather é gravado sem compressão, então a leitura é feita por
+    memory-map, sem passar pelo openpyxl.
+    """
+    pasta = Path(base_dir) / PASTA_SNAPSHOT
+    meta = _ler_meta(pasta)
+    if meta is None or not (pasta / ARQUIVO_SNAPSHOT).exists():
+        return None
+
+    fontes = [Path(c) for c in fontes]
+    try:
+        atuais = assinaturas_fontes(fontes, meta)
+    except OSError:
+        return None
+
+    if impressao_digital(atuais) != meta.get("impressao_digital"):
+        return None
+
+    df = _ler_feather(pasta)
+    if df is None:
+        return None
+
+    # Só o mtime mudou (ex.: cópia do arquivo): atualiza a meta para não rehashear
+    if atuais != meta.get("arquivos"):
+        meta["arquivos"] = atuais
+        _gravar_meta(pasta, meta)
+
+    return df
+
+
+def ler_snapshot_anterior(base_dir: Path) -> Tuple[Optional[pd.DataFrame], Optional[Dict[str, Any]]]:
+    """
+    Último snapshot gravado, mesmo que as planilhas tenham mudado desde então,
+    junto com a sua meta (assinaturas e marcas de ingestão). Usado pela carga
+    incremental.
+    """
+    pasta = Path(base_dir) / PASTA_SNAPSHOT
+    meta = _ler_meta(pasta)
+    if meta is None or not (pasta / ARQUIVO_SNAPSHOT).exists():
+        return None, None
+
+    df = _ler_feather(pasta)
+    if df is None:
+        return None, None
+    return df, meta
+
+
+def _gravar_meta(pasta: Path, meta: Dict[str, Any]) -> None:
+    tmp = pasta / (ARQUIVO_META + ".tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, pasta / ARQUIVO_META)
+    except OSError:
+        pass
+
+
+def gravar_snapshot(
+    df: pd.DataFrame,
+    base_dir: Path,
+    fontes: Iterable[Path],
+    extras: Optional[Dict[str, Any]] = None,
+    assinaturas: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> bool:
+    """
+    Grava a base tratada em Feather (sem compressão) junto com a assinatura
+    das planilhas de origem. Falhas de escrita (pasta somente-leitura,
+    pyarrow ausente) são ignoradas: o snapshot é só um atalho.
+
+    `assinaturas` são as das planilhas tiradas *antes* de lê-las (ver
+    `assinaturas_atuais`). Se alguma planilha mudou desde então, o snapshot
+    não é gravado: a base pode ser da versão antiga (ou de uma mistura das
+    duas). Sem `assinaturas`, usa as do momento da gravação.
+
+    `extras` vai para a meta sem interpretação (ex.: marcas d'água da carga
+    incremental).
+    """
+    pasta = Path(base_dir) / PASTA_SNAPSHOT
+    fontes = [Path(c) for c in fontes]
+    tmp = pasta / f"{ARQUIVO_SNAPSHOT}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        pasta.mkdir(exist_ok=True)
+        atuais = assinaturas_fontes(fontes, {"arquivos": assinaturas} if assinaturas else None)
+        if assinaturas is not None and atuais != assinaturas:
+            return False
+        assinaturas = atuais
+
+        # Invalida o snapshot anterior antes de sobrescrever o arquivo de dados
+        (pasta / ARQUIVO_META).unlink(missing_ok=True)
+
+        df.reset_index(drop=True).to_feather(tmp, compression="uncompressed")
+        os.replace(tmp, pasta / ARQUIVO_SNAPSHOT)
+    except (ImportError, OSError, ValueError):
+        tmp.unlink(missing_ok=True)
+        return False
+
+    _gravar_meta(pasta, {
+        "versao": VERSAO_SNAPSHOT,
+        "impressao_digital": impressao_digital(assinaturas),
+        "arquivos": assinaturas,
+        **(extras or {}),
+    })
+    return True
@@ -1,38 +1,115 @@
 # visualizacoes_recorrencia.py
 
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 
+from instrumentacao import instrumentar
+
 # Paleta "corporativa" Osborne
 OSBORNE_ORANGE = "#F58220"
 OSBORNE_DARK = "#3A3A3A"
 OSBORNE_LIGHT = "#D9D9D9"
 
 
+ESTILO_OSBORNE = {
+    "figure.figsize": (10, 6),
+    "axes.facecolor": "white",
+    "axes.edgecolor": OSBORNE_DARK,
+    "axes.labelcolor": OSBORNE_DARK,
+    "xtick.color": OSBORNE_DARK,
+    "ytick.color": OSBORNE_DARK,
+    "text.color": OSBORNE_DARK,
+    "font.size": 10,
+    "axes.titlesize": 12,
+    "axes.titleweight": "bold",
+    "axes.grid": True,
+    "grid.color": OSBORNE_LIGHT,
+    "grid.linestyle": "--",
+    "grid.alpha": 0.4,
+}
+
+
+# Valores do estilo já validados pelo matplotlib (preenchido na 1ª aplicação)
+_estilo_validado = {}
+
+
 def set_osborne_style():
-    """Configura estilo padrão dos gráficos."""
-    plt.rcParams.update({
-        "figure.figsize": (10, 6),
-        "axes.facecolor": "white",
-        "axes.edgecolor": OSBORNE_DARK,
-        "axes.labelcolor": OSBORNE_DARK,
-        "xtick.color": OSBORNE_DARK,
-        "ytick.color": OSBORNE_DARK,
-        "text.color": OSBORNE_DARK,
-        "font.size": 10,
-        "axes.titlesize": 12,
-        "axes.titleweight": "bold",
-        "axes.grid": True,
-        "grid.color": OSBORNE_LIGHT,
-        "grid.linestyle": "--",
-        "grid.alpha": 0.4,
-    })
+    """Configura estilo padrão dos gráficos (só mexe no rcParams se algo mudou)."""
+    rc = plt.rcParams
+    if _estilo_validado and all(rc[k] == v for k, v in _estilo_validado.items()):
+        return
+
+    rc.update(ESTILO_OSBORNE)
+    _estilo_validado.update({k: rc[k] for k in ESTILO_OSBORNE})
+
+
+# -------------------------------------------------------------------
+# Cache de figuras renderizadas
+# -------------------------------------------------------------------
+MAX_FIGURAS_CACHE = 64
+
+_figuras_cache = OrderedDict()
+_figuras_lock = threading.Lock()
+# pyplot não é thread-safe: sessões do Streamlit renderizam uma de cada vez
+_render_lock = threading.Lock()
+
+
+def impressao_frame(df: pd.DataFrame) -> str:
+    """Hash do conteúdo de um DataFrame (colunas, dtypes e valores), sem depender do objeto."""
+    if df is None:
+        return "none"
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((df.shape, list(df.columns), [str(t) for t in df.dtypes])).encode("utf-8"))
+    if not df.empty:
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def figura_bytes(plot_func, df: pd.DataFrame, *args, formato: str = "png", dpi: int = 200, **kwargs) -> bytes:
+    """
+    Renderiza `plot_func(df, *args, **kwargs)` em bytes (PNG ou SVG) e guarda o
+    resultado num cache LRU (até MAX_FIGURAS_CACHE figuras) chaveado pelo
+    conteúdo de `df` e pelos argumentos. Reexecuções com os mesmos dados não
+    passam pelo matplotlib.
+    """
+    chave = (
+        plot_func.__name__, impressao_frame(df),
+        repr(args), repr(sorted(kwargs.items())), formato, dpi,
+    )
+
+    with _figuras_lock:
+        if chave in _figuras_cache:
+            _figuras_cache.move_to_end(chave)
+            return _figuras_cache[chave]
+
+    with _render_lock:
+        fig = plot_func(df, *args, **kwargs)
+        try:
+            buf = io.BytesIO()
+            fig.savefig(buf, format=formato, dpi=dpi, bbox_inches="tight")
+        finally:
+            plt.close(fig)
+    dados = buf.getvalue()
+
+    with _figuras_lock:
+        _figuras_cache[chave] = dados
+        _figuras_cache.move_to_end(chave)
+        while len(_figuras_cache) > MAX_FIGURAS_CACHE:
+            _figuras_cache.popitem(last=False)
+    return dados
 
 
 # -------------------------------------------------------------------
 # 1) Recorrência mensal (basicos_reqs_mes)
 # -------------------------------------------------------------------
+@instrumentar()
 def plot_top_itens_recorrencia_mensal(df_mes: pd.DataFrame, top_n: int = 15):
     """
     df_mes: saída de basicos_reqs_mes
@@ -65,7 +142,7 @@ def plot_top_itens_recorrencia_mensal(df_mes: pd.DataFrame, top_n: int = 15):
     # Soma recorrência por item (independente de obra/mês)
     agg = (
         df_clean
-        .groupby(["INSUMO_CDG", "INSUMO_DESC"])["QTD_REQS_MES"]
+        .groupby(["INSUMO_CDG", "INSUMO_DESC"], observed=True)["QTD_REQS_MES"]
         .sum()
         .reset_index()
         .sort_values("QTD_REQS_MES", ascending=False)
@@ -96,6 +173,7 @@ def plot_top_itens_recorrencia_mensal(df_mes: pd.DataFrame, top_n: int = 15):
     fig.tight_layout()
     return fig
 
+@instrumentar()
 def plot_recorrencia_mensal_por_obra(df_mes: pd.DataFrame, obra: str | int):
     """
     Filtra df_mes para uma obra específica e mostra a recorrência por item.
@@ -121,7 +199,7 @@ def plot_recorrencia_mensal_por_obra(df_mes: pd.DataFrame, obra: str | int):
 
     # Soma por item
     agg = (
-        base.groupby(["INSUMO_CDG", "INSUMO_DESC"])["QTD_REQS_MES"]
+        base.groupby(["INSUMO_CDG", "INSUMO_DESC"], observed=True)["QTD_REQS_MES"]
         .sum()
         .reset_index()
         .sort_values("QTD_REQS_MES", ascending=True)
@@ -142,6 +220,7 @@ def plot_recorrencia_mensal_por_obra(df_mes: pd.DataFrame, obra: str | int):
 # -------------------------------------------------------------------
 # 2) Requisições subsequentes (basicos_reqs_subsequentes)
 # -------------------------------------------------------------------
+@instrumentar()
 def plot_itens_reqs_subsequentes(df_subseq: pd.DataFrame, top_n: int = 15):
     """
     df_subseq: saída de basicos_reqs_subsequentes
@@ -184,6 +263,7 @@ def plot_itens_reqs_subsequentes(df_subseq: pd.DataFrame, top_n: int = 15):
 # -------------------------------------------------------------------
 # 3) Recorrência semanal por obra (basicos_semanal_por_obra)
 # -------------------------------------------------------------------
+@instrumentar()
 def plot_recorrencia_semanal_heatmap(df_semana: pd.DataFrame, top_itens: int = 10, top_obras: int = 10):
     """
     df_semana: saída de basicos_semanal_por_obra
@@ -203,7 +283,7 @@ def plot_recorrencia_semanal_heatmap(df_semana: pd.DataFrame, top_itens: int = 1
 
     # rank itens por semanas distintas (global)
     itens_top = (
-        df_semana.groupby(["INSUMO_CDG", "INSUMO_DESC"])["SEMANAS_DISTINTAS"]
+        df_semana.groupby(["INSUMO_CDG", "INSUMO_DESC"], observed=True)["SEMANAS_DISTINTAS"]
         .sum()
         .reset_index()
         .sort_values("SEMANAS_DISTINTAS", ascending=False)
@@ -213,7 +293,7 @@ def plot_recorrencia_semanal_heatmap(df_semana: pd.DataFrame, top_itens: int = 1
     # rank obras por nº itens semanais
     obras_top = (
         df_semana[df_semana["INSUMO_CDG"].isin(itens_top)]
-        .groupby(["EMPRD", "EMPRD_DESC"])["SEMANAS_DISTINTAS"]
+        .groupby(["EMPRD", "EMPRD_DESC"], observed=True)["SEMANAS_DISTINTAS"]
         .sum()
         .reset_index()
         .sort_values("SEMANAS_DISTINTAS", ascending=False)
@@ -237,7 +317,8 @@ def plot_recorrencia_semanal_heatmap(df_semana: pd.DataFrame, top_itens: int = 1
         columns="INSUMO_DESC",
         values="SEMANAS_DISTINTAS",
         aggfunc="sum",
-        fill_value=0
+        fill_value=0,
+        observed=True,
     )
 
     obras_labels = []
@@ -263,6 +344,7 @@ def plot_recorrencia_semanal_heatmap(df_semana: pd.DataFrame, top_itens: int = 1
 # -------------------------------------------------------------------
 # 4) Intervalo médio entre pedidos (intervalo_medio_entre_pedidos)
 # -------------------------------------------------------------------
+@instrumentar()
 def plot_intervalo_medio_scatter(df_int: pd.DataFrame):
     """
     df_int: saída de intervalo_medio_entre_pedidos_basicos
@@ -298,6 +380,7 @@ def plot_intervalo_medio_scatter(df_int: pd.DataFrame):
 # -------------------------------------------------------------------
 # 5) Itens pingados (itens pequenas qtds alta frequência)
 # -------------------------------------------------------------------
+@instrumentar()
 def plot_itens_pingados(df_pingados: pd.DataFrame, top_n: int = 15):
     """
     df_pingados: saída de itens_basicos_pequenas_qtds_alta_frequencia